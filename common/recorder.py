@@ -0,0 +1,370 @@
+import numpy as np
+import json
+import os
+import struct
+import sys
+import time
+
+
+# kinds of channel records
+UNCHANGED = 0
+SPARSE = 1
+FULL = 2
+
+
+def _cells(arr):
+    """ view of an array as one row per cell, cells are the first (up to) two axes
+
+    Args:
+        arr (np.array): channel array, e.g. (H, W) or (H, W, 3)
+
+    Returns:
+        np.array: (cells, values per cell) view
+    """
+    num = int(np.prod(arr.shape[:2]))
+    return arr.reshape(num, -1)
+
+
+def _index_dtype(max_value):
+    """ smallest unsigned type that holds max_value
+    """
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if max_value <= np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(np.uint64)
+
+
+class Recorder():
+    def __init__(self, path, keyframe_every=100, palette=None):
+        """ streams the state of a simulation to disk as per-step deltas
+
+        NB:
+        A recording is a directory with a meta.json (channel names, shapes and
+        types), frames.bin and index.npy (byte offset of every step). A frame is
+        a dict of named arrays, e.g. World.get_frame(). Every step each channel
+        is stored as the sorted indices of its changed cells, delta encoded in
+        the smallest unsigned type, together with their new values. If that
+        is larger than the channel itself the whole channel is stored instead.
+        Every keyframe_every steps all channels are stored whole, so a Player
+        can seek without decoding from the start.
+
+        Args:
+            path (string): directory of the recording, created if needed
+            keyframe_every (int, optional): interval of the keyframes in steps. Defaults to 100.
+            palette (list, optional): RGB colors of the values of the first channel, used for playback. Defaults to None.
+        """
+        self.path = path
+        self.keyframe_every = keyframe_every
+        self.palette = palette
+
+        os.makedirs(self.path, exist_ok=True)
+        self.file = open(os.path.join(self.path, "frames.bin"), "wb")
+
+        self.channels = None # names in recording order
+        self.prev = {} # state of the last recorded step
+        self.offsets = []
+        self.keyframes = []
+        self.bytes = 0
+        return
+
+
+    def _write(self, data):
+        self.file.write(data)
+        self.bytes += len(data)
+        return
+
+
+    def _start(self, frame):
+        """ write meta.json on the first frame
+        """
+        self.channels = list(frame.keys())
+        meta = {
+            "channels" : [{"name" : name, "shape" : list(frame[name].shape), "dtype" : frame[name].dtype.str} for name in self.channels],
+            "keyframe_every" : self.keyframe_every,
+            "palette" : self.palette,
+        }
+        with open(os.path.join(self.path, "meta.json"), "w") as f:
+            json.dump(meta, f)
+        return
+
+
+    def record(self, frame, changed=None):
+        """ append one step
+
+        Args:
+            frame (dict): name -> np.array, the same names, shapes and types every step
+            changed (dict, optional): name -> flat indices of the only cells of that channel that can have changed,
+                e.g. from CycleLangtons.changes, which saves comparing the whole channel. Defaults to None.
+        """
+        if self.channels is None:
+            self._start(frame)
+
+        step = len(self.offsets)
+        keyframe = step % self.keyframe_every == 0
+        self.offsets.append(self.bytes)
+        self.keyframes.append(keyframe)
+        self._write(struct.pack("<B", keyframe))
+
+        for name in self.channels:
+            arr = np.ascontiguousarray(frame[name])
+
+            if keyframe:
+                self._write(struct.pack("<B", FULL))
+                self._write(arr.tobytes())
+                self.prev[name] = arr.copy()
+                continue
+
+            # find the changed cells
+            prev = _cells(self.prev[name])
+            new = _cells(arr)
+            if changed is not None and name in changed:
+                candidates = np.unique(np.asarray(changed[name], dtype=np.int64))
+                idx = candidates[np.any(prev[candidates] != new[candidates], axis=1)]
+            else:
+                idx = np.flatnonzero(np.any(prev != new, axis=1))
+
+            if len(idx) == 0:
+                self._write(struct.pack("<B", UNCHANGED))
+                continue
+
+            deltas = np.diff(idx, prepend=0)
+            idx_dtype = _index_dtype(deltas.max())
+            values = new[idx]
+
+            if len(idx) * idx_dtype.itemsize + values.nbytes >= arr.nbytes:
+                self._write(struct.pack("<B", FULL))
+                self._write(arr.tobytes())
+            else:
+                self._write(struct.pack("<BIB", SPARSE, len(idx), idx_dtype.itemsize))
+                self._write(deltas.astype(idx_dtype).tobytes())
+                self._write(values.tobytes())
+
+            prev[idx] = values
+        return
+
+
+    def step(self, sim):
+        """ record the current state of a simulation, call after every update()
+
+        Args:
+            sim (object): anything with get_frame(), e.g. World, Conways or CycleLangtons,
+                if it has get_changed() that is used as the changed cells of record()
+        """
+        changed = sim.get_changed() if hasattr(sim, "get_changed") else None
+        self.record(sim.get_frame(), changed=changed)
+        return
+
+
+    def close(self):
+        """ finish the recording and write the index
+        """
+        self.file.close()
+        index = np.stack([np.array(self.offsets, dtype=np.int64), np.array(self.keyframes, dtype=np.int64)], axis=1).reshape(-1, 2)
+        np.save(os.path.join(self.path, "index.npy"), index)
+        return
+
+
+
+class Player():
+    def __init__(self, path):
+        """ random access playback of a recording written by a Recorder
+
+        NB:
+        frames.bin is memory-mapped, seeking to a step decodes forward from the
+        last keyframe before it, iterating applies one delta per step in place.
+        The returned frames are the player's internal state, copy them to keep
+        them beyond the next step. If index.npy is missing (the recorder was
+        not closed) it is rebuilt by scanning the file.
+
+        Args:
+            path (string): directory of the recording
+        """
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+
+        self.channels = [c["name"] for c in meta["channels"]]
+        self.shapes = {c["name"]: tuple(c["shape"]) for c in meta["channels"]}
+        self.dtypes = {c["name"]: np.dtype(c["dtype"]) for c in meta["channels"]}
+        self.palette = meta["palette"]
+
+        self.data = np.memmap(os.path.join(path, "frames.bin"), dtype=np.uint8, mode="r")
+        self.frame = {name: np.zeros(self.shapes[name], dtype=self.dtypes[name]) for name in self.channels}
+        self.pos = -1 # step of the current frame
+
+        index_path = os.path.join(path, "index.npy")
+        if os.path.exists(index_path):
+            index = np.load(index_path)
+        else:
+            index = self._scan()
+        self.offsets = index[:, 0]
+        self.keyframes = np.flatnonzero(index[:, 1])
+        return
+
+
+    def __len__(self):
+        return len(self.offsets)
+
+
+    def _decode(self, offset, apply=True):
+        """ decode the step at a byte offset
+
+        Args:
+            offset (int): byte offset of the step in frames.bin
+            apply (bool, optional): whether to apply it to the current frame. Defaults to True.
+
+        Returns:
+            tuple(int, bool): (offset of the next step, whether the step is a keyframe)
+        """
+        data = self.data
+        keyframe = bool(data[offset])
+        offset += 1
+
+        for name in self.channels:
+            kind = data[offset]
+            offset += 1
+            arr = self.frame[name]
+
+            if kind == FULL:
+                if apply:
+                    arr[...] = np.frombuffer(data, dtype=arr.dtype, count=arr.size, offset=offset).reshape(arr.shape)
+                offset += arr.nbytes
+
+            elif kind == SPARSE:
+                count, itemsize = struct.unpack_from("<IB", data, offset)
+                offset += 5
+                idx_dtype = np.dtype(f"u{itemsize}")
+                cells = _cells(arr)
+                per_cell = cells.shape[1]
+
+                if apply:
+                    idx = np.cumsum(np.frombuffer(data, dtype=idx_dtype, count=count, offset=offset), dtype=np.int64)
+                    values = np.frombuffer(data, dtype=arr.dtype, count=count * per_cell, offset=offset + count * itemsize)
+                    cells[idx] = values.reshape(count, per_cell)
+                offset += count * itemsize + count * per_cell * arr.dtype.itemsize
+
+        return offset, keyframe
+
+
+    def _scan(self):
+        """ rebuild the index of an unfinished recording
+
+        Returns:
+            np.array: (steps, 2) array of byte offsets and keyframe flags
+        """
+        index = []
+        offset = 0
+        while offset < len(self.data):
+            start = offset
+            offset, keyframe = self._decode(offset, apply=False)
+            if offset > len(self.data): # step cut off by an interruption
+                break
+            index.append((start, keyframe))
+        return np.array(index, dtype=np.int64).reshape(-1, 2)
+
+
+    def seek(self, step):
+        """ go to a step
+
+        Args:
+            step (int): step to go to, negative counts from the end
+
+        Returns:
+            dict: name -> np.array, the frame at that step
+        """
+        step = step % len(self)
+
+        # decode from the last keyframe unless the current frame is closer
+        key = self.keyframes[np.searchsorted(self.keyframes, step, side="right") - 1]
+        start = key if not (key <= self.pos <= step) else self.pos + 1
+        for s in range(start, step + 1):
+            self._decode(self.offsets[s])
+
+        self.pos = step
+        return self.frame
+
+
+    def next(self):
+        """ advance by one step
+
+        Returns:
+            dict: the next frame, None at the end of the recording
+        """
+        if self.pos + 1 >= len(self):
+            return None
+        self._decode(self.offsets[self.pos + 1])
+        self.pos += 1
+        return self.frame
+
+
+    def __iter__(self):
+        """ play from the current position to the end
+        """
+        while True:
+            frame = self.next()
+            if frame is None:
+                return
+            yield frame
+
+
+    def get_colors(self):
+        """ RGB image of the current frame, for playback
+
+        NB:
+        A channel with 3 values per cell is shown as is, otherwise the first
+        channel through the palette of the recording, or as grayscale.
+
+        Returns:
+            np.array: (H, W, 3) uint8 array
+        """
+        for name in self.channels:
+            if len(self.shapes[name]) == 3 and self.shapes[name][2] == 3:
+                return self.frame[name]
+
+        values = self.frame[self.channels[0]]
+        if self.palette is not None:
+            return np.array(self.palette, dtype=np.uint8)[values]
+
+        top = max(values.max(), 1)
+        gray = (255 * (values.astype(np.float64) / top)).astype(np.uint8)
+        return np.repeat(gray[..., None], 3, axis=2)
+
+
+
+if __name__ == "__main__":
+    import pygame
+    import renderer
+
+    SIM_PIX_SIZE = 4
+    STEPS_PER_FRAME = 1
+
+    player = Player(sys.argv[1])
+    start = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+    print(f"{len(player)} steps, keyframes every {player.keyframes[1] if len(player.keyframes) > 1 else len(player)} steps")
+
+    player.seek(start)
+    num_sim_pix_y, num_sim_pix_x = player.get_colors().shape[:2]
+
+    pygame.init()
+    screen = pygame.display.set_mode((num_sim_pix_x * SIM_PIX_SIZE, num_sim_pix_y * SIM_PIX_SIZE))
+    pygame.display.set_caption("Replay of " + sys.argv[1])
+
+    canvas = renderer.Renderer(screen, SIM_PIX_SIZE)
+
+    running = True
+    t = time.time()
+    while running and player.pos + 1 < len(player):
+        for _ in range(STEPS_PER_FRAME):
+            if player.next() is None:
+                break
+
+        canvas.draw(player.get_colors())
+
+        for event in pygame.event.get(): # exit condition
+            if event.type == pygame.QUIT:
+                running = False
+
+        canvas.present()
+
+    print(f"played {player.pos - start} steps in {time.time() - t:.2f} s")
+    pygame.quit()
+    sys.exit()
@@ -0,0 +1,80 @@
+import numpy as np
+import pygame
+
+
+def from_palette(values, palette):
+    """ RGB image of an array of color indices, e.g. CycleLangtons.life with CycleLangtons.colors
+
+    Args:
+        values (np.array): (H, W) integer array of indices into the palette
+        palette (list): RGB tuple per index
+
+    Returns:
+        np.array: (H, W, 3) uint8 array
+    """
+    return np.asarray(palette, dtype=np.uint8)[values]
+
+
+def from_plants(shape, locations, colors, background=(0, 0, 0)):
+    """ RGB image of plants, e.g. from World.get_plants()
+
+    Args:
+        shape (tuple): (H, W) of the world
+        locations (np.array): (N, 2) array of (y, x) locations
+        colors (np.array): (N, 3) array of RGB colors
+        background (tuple, optional): color of empty cells. Defaults to (0, 0, 0).
+
+    Returns:
+        np.array: (H, W, 3) uint8 array
+    """
+    image = np.empty(tuple(shape) + (3,), dtype=np.uint8)
+    image[...] = background
+    image[locations[:, 0], locations[:, 1]] = colors
+    return image
+
+
+class Renderer():
+    def __init__(self, screen, pix_size):
+        """ draws RGB images of a simulation onto the screen, one simulated pixel as pix_size x pix_size real pixels
+
+        NB:
+        draw() copies a whole image into a surface of one pixel per cell and
+        scales it onto the screen in one go. present() only flips the display
+        if something was drawn since the last present().
+
+        Args:
+            screen (pygame.Surface): display surface
+            pix_size (int): side length of a simulated pixel in real pixels
+        """
+        self.screen = screen
+        self.pix_size = pix_size
+        self.surface = None # one pixel per cell, created on the first draw()
+        self.rects = None # rects changed since the last present(), None for the whole screen, [] if nothing changed
+        return
+
+
+    def draw(self, image):
+        """ draw a whole image
+
+        Args:
+            image (np.array): (H, W, 3) uint8 array, see from_palette() and from_plants()
+        """
+        h, w = image.shape[:2]
+        if self.surface is None or self.surface.get_size() != (w, h):
+            self.surface = pygame.Surface((w, h))
+
+        pygame.surfarray.blit_array(self.surface, image.swapaxes(0, 1)) # surfarrays are indexed (x, y)
+        pygame.transform.scale(self.surface, (w * self.pix_size, h * self.pix_size), self.screen)
+        self.rects = None
+        return
+
+
+    def present(self):
+        """ show what was drawn since the last present()
+        """
+        if self.rects is None:
+            pygame.display.flip()
+        else:
+            pygame.display.update(self.rects)
+        self.rects = []
+        return
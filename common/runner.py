@@ -0,0 +1,167 @@
+import collections
+import threading
+import time
+
+
+class FrameBuffer():
+    def __init__(self, size):
+        """ bounded ring buffer of snapshots between a producer and a consumer thread
+
+        Args:
+            size (int): maximum number of snapshots held
+        """
+        self.size = size
+        self.items = collections.deque()
+        self.cond = threading.Condition()
+        return
+
+
+    def full(self):
+        """ whether a put() would have to wait
+        """
+        with self.cond:
+            return len(self.items) >= self.size
+
+
+    def put(self, item, stop=None):
+        """ append a snapshot, waiting while the buffer is full
+
+        Args:
+            item (object): snapshot
+            stop (threading.Event, optional): give up waiting once this is set. Defaults to None.
+
+        Returns:
+            bool: whether the snapshot was added
+        """
+        with self.cond:
+            while len(self.items) >= self.size:
+                if stop is not None and stop.is_set():
+                    return False
+                self.cond.wait(timeout=0.1)
+
+            self.items.append(item)
+            return True
+
+
+    def get(self):
+        """ take the oldest snapshot out without waiting
+
+        Returns:
+            object: snapshot, None if the buffer is empty
+        """
+        with self.cond:
+            if len(self.items) == 0:
+                return None
+
+            item = self.items.popleft()
+            self.cond.notify_all()
+            return item
+
+
+    def wake(self):
+        """ wake up a waiting put(), e.g. to stop
+        """
+        with self.cond:
+            self.cond.notify_all()
+        return
+
+
+
+class Runner():
+    def __init__(self, step, snapshot, steps_per_frame=1, buffer_size=2):
+        """ runs a simulation in a worker thread, decoupled from the display loop
+
+        NB:
+        The worker calls step() and publishes snapshot() into a FrameBuffer,
+        the display loop takes them out with frame() at its own pace (e.g.
+        pygame.time.Clock.tick(FPS)), so a slow render never slows the
+        simulation down and a heavy step never blocks the event loop.
+        snapshot() runs in the worker right after the steps, so it must return
+        a copy (e.g. an image built from the state) rather than live arrays.
+
+        With steps_per_frame = N the worker makes N steps per snapshot and waits
+        while the buffer is full, so every N-th state is shown in order. With
+        steps_per_frame = None it steps as fast as possible and only takes a
+        snapshot when the buffer has room. Snapshots are never dropped, so a
+        snapshot may also describe what changed since the last one.
+
+        Args:
+            step (callable): advances the simulation by one step, e.g. world.update
+            snapshot (callable): returns what the display needs of the current state
+            steps_per_frame (int, optional): steps per snapshot, None for as fast as possible. Defaults to 1.
+            buffer_size (int, optional): maximum number of snapshots waiting for the display, the display lags
+                at most this many frames behind. Defaults to 2.
+        """
+        self.step = step
+        self.snapshot = snapshot
+        self.steps_per_frame = steps_per_frame
+        self.buffer = FrameBuffer(buffer_size)
+
+        self.stopped = threading.Event()
+        self.thread = None
+        self.error = None # exception raised in the worker, re-raised by frame()
+
+        self.steps = 0
+        self.start_time = None
+        return
+
+
+    def _work(self):
+        try:
+            while not self.stopped.is_set():
+                if self.steps_per_frame is None:
+                    self.step()
+                    self.steps += 1
+                    if not self.buffer.full():
+                        self.buffer.put(self.snapshot())
+                else:
+                    for _ in range(self.steps_per_frame):
+                        self.step()
+                        self.steps += 1
+                    self.buffer.put(self.snapshot(), stop=self.stopped)
+        except Exception as e:
+            self.error = e
+        return
+
+
+    def start(self):
+        """ start the worker thread
+        """
+        self.stopped.clear()
+        self.start_time = time.time()
+        self.thread = threading.Thread(target=self._work, daemon=True)
+        self.thread.start()
+        return
+
+
+    def stop(self):
+        """ stop the worker after its current step and wait for it
+        """
+        self.stopped.set()
+        self.buffer.wake()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        return
+
+
+    def frame(self):
+        """ next snapshot for the display, without waiting
+
+        Returns:
+            object: snapshot, None if there is no new one
+
+        Raises:
+            Exception: re-raised if the simulation failed in the worker
+        """
+        if self.error is not None:
+            raise self.error
+        return self.buffer.get()
+
+
+    def steps_per_sec(self):
+        """ simulation speed since start()
+        """
+        if self.start_time is None:
+            return 0.0
+        return self.steps / max(time.time() - self.start_time, 1e-12)
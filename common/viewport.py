@@ -0,0 +1,263 @@
+import numpy as np
+import threading
+
+
+class Pyramid():
+    def __init__(self, shape, reduce="max", block=8, top=256, channels=3):
+        """ mipmap pyramid of an RGB (or grayscale) image of the world, for drawing it zoomed out
+
+        NB:
+        Level l holds the image reduced by 2**l per axis, every pixel the max
+        (or mean) of the 2 x 2 pixels below it. "max" keeps single live cells
+        visible when zoomed out, "mean" blends. The levels are divided into
+        blocks of block x block pixels; writes note the blocks they touch and
+        refresh() only recomputes those blocks on every level, so a few
+        changes per step cost a few blocks instead of the whole world.
+        The levels are padded with black to a multiple of the block size of the
+        top level. Writes and reads from different threads hold self.lock.
+        With channels=1 the levels are (h, w) uint8 grayscale, a third of the
+        memory of RGB for huge grayscale worlds like Conways(compact=True).
+
+        Args:
+            shape (tuple): (H, W) of the world
+            reduce (string, optional): "max" or "mean". Defaults to "max".
+            block (int, optional): side length of the blocks in pixels. Defaults to 8.
+            top (int, optional): levels are added until the top level is at most this many pixels wide and high. Defaults to 256.
+            channels (int, optional): 3 for RGB, 1 for grayscale. Defaults to 3.
+
+        Raises:
+            ValueError: raised for an unknown reduce
+        """
+        if reduce not in ("max", "mean"):
+            raise ValueError("unexpected reduce " + str(reduce))
+
+        self.shape = tuple(shape)
+        self.reduce = reduce
+        self.block = block
+        self.channels = channels
+        self.lock = threading.Lock()
+
+        num = 1
+        while max(self.shape) / 2**(num - 1) > top and max(self.shape) / 2**num >= block:
+            num += 1
+
+        unit = block * 2**(num - 1)
+        h = -(-self.shape[0] // unit) * unit
+        w = -(-self.shape[1] // unit) * unit
+        self.pixel = () if channels == 1 else (channels,) # trailing shape of a pixel
+        self.levels = [np.zeros((h >> l, w >> l) + self.pixel, dtype=np.uint8) for l in range(num)]
+        self.blocks = (h // block, w // block) # number of blocks of level 0
+        self.dirty = [] # (y, x) arrays of changed blocks of level 0
+        return
+
+
+    def level_shape(self, l):
+        """ (H, W) of the world at level l, without the padding
+        """
+        return -(-self.shape[0] // 2**l), -(-self.shape[1] // 2**l)
+
+
+    def set(self, image, dirty=None, y=0, x=0):
+        """ replace the full-resolution image, or a rectangle of it
+
+        NB:
+        Without dirty, only the pixels of the rectangle are compared, so
+        writing just the rows or tiles that may have changed costs their
+        size and not that of the world.
+
+        Args:
+            image (np.array): (h, w, 3) uint8 array, (h, w) with channels=1, the whole (H, W) world unless y and x are given
+            dirty (np.array, optional): (by, bx) boolean array of the changed blocks of level 0, if None found by comparison. Defaults to None.
+            y (int, optional): row of the world at the top of the image. Defaults to 0.
+            x (int, optional): column of the world at the left of the image. Defaults to 0.
+        """
+        h, w = image.shape[:2]
+        region = self.levels[0][y:y + h, x:x + w]
+        if dirty is None:
+            # changed pixels in a block aligned frame around the rectangle
+            b = self.block
+            y0, x0 = y // b * b, x // b * b
+            changed = np.zeros((-(-(y + h - y0) // b) * b, -(-(x + w - x0) // b) * b), dtype=bool)
+            diff = region != image
+            changed[y - y0:y - y0 + h, x - x0:x - x0 + w] = diff if self.channels == 1 else np.any(diff, axis=2)
+            by, bx = np.nonzero(changed.reshape(changed.shape[0] // b, b, changed.shape[1] // b, b).any(axis=(1, 3)))
+            self.dirty.append((by + y0 // b, bx + x0 // b))
+        else:
+            self.dirty.append(np.nonzero(dirty))
+
+        region[...] = image
+        return
+
+
+    def set_cells(self, cells, colors):
+        """ change single pixels of the full-resolution image
+
+        Args:
+            cells (np.array): (N, 2) array of (y, x) locations
+            colors (np.array): (N, 3) array of RGB colors, (N,) with channels=1
+        """
+        cells = np.asarray(cells, dtype=np.int64).reshape(-1, 2)
+        self.levels[0][cells[:, 0], cells[:, 1]] = np.asarray(colors, dtype=np.uint8).reshape((-1,) + self.pixel)
+        self.dirty.append((cells[:, 0] // self.block, cells[:, 1] // self.block))
+        return
+
+
+    def refresh(self):
+        """ recompute the changed blocks of all levels above level 0
+        """
+        if len(self.dirty) == 0:
+            return
+
+        b = self.block
+        by = np.concatenate([d[0] for d in self.dirty])
+        bx = np.concatenate([d[1] for d in self.dirty])
+        self.dirty = []
+
+        for l in range(1, len(self.levels)):
+            nby, nbx = self.blocks[0] >> l, self.blocks[1] >> l
+            flat = np.unique((by // 2) * nbx + bx // 2)
+            by, bx = flat // nbx, flat % nbx
+
+            # every block of level l is reduced from 2 x 2 blocks of level l - 1, a bounded number at a time
+            src_blocks = self.levels[l - 1].reshape((nby, 2 * b, nbx, 2 * b) + self.pixel)
+            dst_blocks = self.levels[l].reshape((nby, b, nbx, b) + self.pixel)
+            chunk = max(1, 2**20 // (b * b))
+            for start in range(0, len(by), chunk):
+                cy, cx = by[start:start + chunk], bx[start:start + chunk]
+                src = src_blocks[cy, :, cx].reshape((len(cy), b, 2, b, 2) + self.pixel)
+                corners = [src[:, :, i, :, j] for i in (0, 1) for j in (0, 1)]
+                if self.reduce == "max":
+                    reduced = np.maximum(np.maximum(corners[0], corners[1]), np.maximum(corners[2], corners[3]))
+                else:
+                    reduced = ((corners[0].astype(np.uint16) + corners[1] + corners[2] + corners[3]) // 4).astype(np.uint8)
+                dst_blocks[cy, :, cx] = reduced
+        return
+
+
+
+class Viewport():
+    def __init__(self, world_shape, screen_size, zoom=1.0, center=None, max_zoom=64):
+        """ pan and zoom view of a toroidal world
+
+        NB:
+        zoom is the number of screen pixels per world cell. render() samples one
+        world cell per screen pixel from the pyramid level closest to the zoom,
+        so its cost depends on the screen size only, not on the world size.
+        Drag with the left mouse button or use the arrow keys to pan, the
+        mouse wheel or +/- to zoom.
+
+        Args:
+            world_shape (tuple): (H, W) of the world
+            screen_size (tuple): (width, height) of the screen in pixels
+            zoom (float, optional): initial screen pixels per cell. Defaults to 1.0.
+            center (tuple, optional): initial (y, x) world coordinates at the center of the screen, if None the center of the world. Defaults to None.
+            max_zoom (float, optional): largest zoom. Defaults to 64.
+        """
+        self.world_shape = tuple(world_shape)
+        self.screen_size = tuple(screen_size)
+        self.min_zoom = min(screen_size[0] / world_shape[1], screen_size[1] / world_shape[0], 1.0) # whole world visible
+        self.max_zoom = max_zoom
+
+        if center is None:
+            center = (world_shape[0] / 2, world_shape[1] / 2)
+
+        # (y, x, zoom) as one tuple, so another thread always reads a consistent view
+        self.view = (float(center[0]), float(center[1]), float(np.clip(zoom, self.min_zoom, self.max_zoom)))
+        return
+
+
+    def to_world(self, pos):
+        """ world coordinates of a screen position
+
+        Args:
+            pos (tuple): (x, y) screen pixels
+
+        Returns:
+            tuple: (y, x) world coordinates, not wrapped
+        """
+        cy, cx, zoom = self.view
+        return cy + (pos[1] - self.screen_size[1] / 2) / zoom, cx + (pos[0] - self.screen_size[0] / 2) / zoom
+
+
+    def pan(self, dx, dy):
+        """ move the view by a number of screen pixels
+
+        Args:
+            dx (float): screen pixels to the right
+            dy (float): screen pixels down
+        """
+        cy, cx, zoom = self.view
+        h, w = self.world_shape
+        self.view = ((cy + dy / zoom) % h, (cx + dx / zoom) % w, zoom)
+        return
+
+
+    def zoom_at(self, factor, pos=None):
+        """ zoom, keeping the world point under a screen position in place
+
+        Args:
+            factor (float): zoom factor, > 1 zooms in
+            pos (tuple, optional): (x, y) screen pixels, if None the center of the screen. Defaults to None.
+        """
+        pos = (self.screen_size[0] / 2, self.screen_size[1] / 2) if pos is None else pos
+        y, x = self.to_world(pos)
+        zoom = float(np.clip(self.view[2] * factor, self.min_zoom, self.max_zoom))
+
+        h, w = self.world_shape
+        cy = y - (pos[1] - self.screen_size[1] / 2) / zoom
+        cx = x - (pos[0] - self.screen_size[0] / 2) / zoom
+        self.view = (cy % h, cx % w, zoom)
+        return
+
+
+    def handle(self, event):
+        """ pan and zoom on pygame mouse and key events
+
+        Args:
+            event (pygame.event.Event): any event, the irrelevant ones are ignored
+        """
+        import pygame
+
+        if event.type == pygame.MOUSEWHEEL:
+            self.zoom_at(1.25 ** event.y, pygame.mouse.get_pos())
+        elif event.type == pygame.MOUSEMOTION and event.buttons[0]:
+            self.pan(-event.rel[0], -event.rel[1])
+        elif event.type == pygame.KEYDOWN:
+            step = min(self.screen_size) / 8
+            moves = {pygame.K_LEFT : (-step, 0), pygame.K_RIGHT : (step, 0), pygame.K_UP : (0, -step), pygame.K_DOWN : (0, step)}
+            if event.key in moves:
+                self.pan(*moves[event.key])
+            elif event.key in (pygame.K_PLUS, pygame.K_EQUALS, pygame.K_KP_PLUS):
+                self.zoom_at(2.0)
+            elif event.key in (pygame.K_MINUS, pygame.K_KP_MINUS):
+                self.zoom_at(0.5)
+        return
+
+
+    def render(self, pyramid):
+        """ the visible part of the world at screen resolution
+
+        Args:
+            pyramid (Pyramid): pyramid of the world
+
+        Returns:
+            np.array: (height, width, 3) uint8 array, e.g. for renderer.Renderer with a pix_size of 1, also for a grayscale pyramid
+        """
+        cy, cx, zoom = self.view
+        width, height = self.screen_size
+        scale = 1 / zoom # world cells per screen pixel
+
+        # coarsest level that still has at least one pixel per screen pixel
+        l = int(np.clip(np.floor(np.log2(scale)), 0, len(pyramid.levels) - 1)) if scale > 1 else 0
+        f = 2**l
+        h, w = pyramid.level_shape(l)
+
+        ys = np.floor((cy + (np.arange(height) + 0.5 - height / 2) * scale) / f).astype(np.int64) % h
+        xs = np.floor((cx + (np.arange(width) + 0.5 - width / 2) * scale) / f).astype(np.int64) % w
+
+        with pyramid.lock:
+            image = pyramid.levels[l][ys[:, None], xs[None, :]]
+
+        if image.ndim == 2:
+            return np.repeat(image[..., None], 3, axis=2) # gray only becomes RGB at screen size
+        return image
@@ -26,6 +26,48 @@ def network(genome, inputs):
 
     return x
 
+def batch_network(weights, inputs):
+    """ the standard network evaluated for a whole population in one pass
+
+    NB:
+    Row i of the inputs is passed through the layers of genome i, so the result
+    matches calling network() once per plant, but each layer is a single
+    grouped matmul over all plants.
+
+    Args:
+        weights (list(np.array)): stacked genes, one (N, in, out) array per layer following config["genome_size"]
+        inputs (np.array): (N, in) "sensory" inputs of all plant cells
+
+    Returns:
+        np.array: (N, out) network outputs
+    """
+    x = inputs
+
+    for w in weights:
+        x = batch_linear(w, x)
+        x = tanh(x)
+
+    return x
+
+def batch_decisions(out):
+    """ clean the raw network outputs of a whole population, see PlantCell.think
+
+    Args:
+        out (np.array): (N, 9) network outputs
+
+    Returns:
+        tuple(np.array, np.array, np.array): (
+            repr : (N, 4) array that indicates in clockwise dir where to add a descendant,
+            send_e : (N, 4) array that indicates in clockwise dir how much energy to send,
+            send_inf : (N,) array setting the information status of the cells
+        )
+    """
+    repr = (out[:, :4] >= 0.5).astype(out.dtype) # round to indicate clear decision
+    send_e = np.maximum(out[:, 4:8], 0) # cannot send negative energy (that's mean)
+    set_inf = (out[:, 8] >= 0.5).astype(out.dtype) # round to indicate clear information
+
+    return repr, send_e, set_inf
+
 def linear(weights, inputs):
     """ linear layer
 
@@ -41,6 +83,18 @@ def linear(weights, inputs):
     """
     return weights.T @ inputs
 
+def batch_linear(weights, inputs):
+    """ linear layer applied with a different weight matrix per row of inputs
+
+    Args:
+        weights (np.array): (N, in, out) weights
+        inputs (np.array): (N, in) inputs from prev layer
+
+    Returns:
+        np.array: (N, out) layer output
+    """
+    return np.matmul(inputs[:, None, :], weights)[:, 0, :]
+
 def sigmoid(x):
     return 1/(1 + np.exp(-x))
 
@@ -0,0 +1,318 @@
+import numpy as np
+import json
+import os
+import shutil
+import threading
+import domains, genome, plants, world
+
+
+GRIDS = ["life", "light", "infos", "energies", "nutrients", "nutrients_age"]
+
+
+def _json_config(config):
+    """ the JSON-serializable part of a config, tuples become lists and e.g. seed masks are dropped
+
+    Args:
+        config (dictionary): global parameters
+
+    Returns:
+        dictionary: serializable config
+    """
+    clean = {}
+    for key, value in config.items():
+        try:
+            clean[key] = json.loads(json.dumps(value))
+        except TypeError:
+            continue
+    return clean
+
+
+def state(field):
+    """ columnar snapshot of the complete state of a world
+
+    NB:
+    The returned arrays are copies, so the world may continue to run while they
+    are written (see Checkpointer).
+
+    Args:
+        field (World): world to snapshot
+
+    Returns:
+        tuple(dict, dict): (name -> np.array of all grids and plant columns, JSON-serializable meta data)
+    """
+    arrays = {name: getattr(field, name).copy() for name in GRIDS}
+
+    tile_rng_states = None
+    if isinstance(field, domains.DistributedWorld): # the plants live in the tiles
+        columns, tile_rng_states = field.get_state()
+        arrays.update(columns)
+        backend = "domains"
+
+    elif hasattr(field, "population"): # ArrayWorld
+        arrays.update(field.population.get_columns())
+        backend = "arrays"
+
+    else:
+        ents = field.entities
+        arrays["location"] = np.array([plant.location for plant in ents], dtype=np.int64).reshape(-1, 2)
+        arrays["energy"] = np.array([plant.energy for plant in ents], dtype=field.dtype)
+        arrays["init_e"] = np.array([plant.init_e for plant in ents], dtype=field.dtype)
+        arrays["age"] = np.array([plant.age for plant in ents], dtype=np.int64)
+        for i, shp in enumerate(field.config["genome_size"]):
+            arrays[f"genes_{i}"] = np.array([plant.genome.normal_genes[i] for plant in ents], dtype=field.dtype).reshape((-1,) + tuple(shp))
+        arrays["nutrition"] = np.array([plant.genome.nutrition for plant in ents], dtype=field.dtype).reshape(-1, field.config["num_nutrients"])
+        arrays["color"] = np.array([plant.genome.color for plant in ents], dtype=np.uint8).reshape(-1, 3)
+        backend = "objects"
+
+    meta = {
+        "backend" : backend,
+        "world_age" : field.world_age,
+        "config" : _json_config(field.config),
+        "rng_state" : field.rng.bit_generator.state,
+    }
+    if tile_rng_states is not None:
+        meta["tile_rng_states"] = tile_rng_states
+    return arrays, meta
+
+
+def write(arrays, meta, path):
+    """ write a snapshot as a directory of raw .npy arrays and a meta.json
+
+    NB:
+    Everything is written to path.tmp first. An existing checkpoint is then
+    renamed to path.old, path.tmp renamed to path and path.old removed, so an
+    interrupted write always leaves a complete checkpoint at path or, between
+    the two renames, at path.old, which load() falls back to.
+
+    Args:
+        arrays (dict): name -> np.array, see state()
+        meta (dict): meta data, see state()
+        path (string): directory of the checkpoint
+    """
+    tmp = path + ".tmp"
+    if os.path.exists(tmp):
+        shutil.rmtree(tmp)
+    os.makedirs(tmp)
+
+    for name, arr in arrays.items():
+        np.save(os.path.join(tmp, name + ".npy"), arr)
+
+    with open(os.path.join(tmp, "meta.json"), "w") as f:
+        json.dump(meta, f)
+
+    old = path + ".old"
+    if os.path.exists(old):
+        shutil.rmtree(old)
+    if os.path.exists(path):
+        os.replace(path, old)
+    os.replace(tmp, path)
+    if os.path.exists(old):
+        shutil.rmtree(old)
+    return
+
+
+def save(field, path):
+    """ save a world, see load()
+
+    Args:
+        field (World): world to save
+        path (string): directory of the checkpoint, replaced if it exists
+    """
+    arrays, meta = state(field)
+    write(arrays, meta, path)
+    return
+
+
+def load(path):
+    """ rebuild a world from a checkpoint written by save()
+
+    NB:
+    The arrays are memory-mapped and copied straight into the new world. For an
+    ArrayWorld no plant is processed individually; the object backend has to
+    create one PlantCell per plant (but does not draw any random numbers). A
+    DistributedWorld is restarted with the same tiles, every tile gets its
+    plants and the state of its random generator back.
+
+    Args:
+        path (string): directory of the checkpoint, path.old is used if a write() was interrupted before path existed
+
+    Returns:
+        World: World, ArrayWorld or DistributedWorld, depending on what was saved
+    """
+    if not os.path.exists(path) and os.path.exists(path + ".old"):
+        path = path + ".old"
+
+    with open(os.path.join(path, "meta.json")) as f:
+        meta = json.load(f)
+
+    arrays = {}
+    for name in os.listdir(path):
+        if name.endswith(".npy"):
+            arrays[name[:-4]] = np.load(os.path.join(path, name), mmap_mode="r")
+
+    # create an empty world with the saved config, then fill in the state
+    config = meta["config"]
+    world_classes = {"arrays" : world.ArrayWorld, "domains" : domains.DistributedWorld}
+    world_class = world_classes.get(meta["backend"], world.World)
+    field = world_class(dict(config, starting_num=0))
+    field.config = config
+    field.world_age = meta["world_age"]
+
+    for name in GRIDS:
+        getattr(field, name)[...] = arrays[name] # in place, the grids of a DistributedWorld are shared
+
+    n = len(arrays["location"])
+    genes = [arrays[f"genes_{i}"] for i in range(len(config["genome_size"]))]
+    columns = {name: arrays[name] for name in arrays if name not in GRIDS}
+
+    if meta["backend"] == "domains":
+        field.set_state(columns, meta["tile_rng_states"])
+
+    elif meta["backend"] == "arrays":
+        field.population.add_columns(columns)
+
+    else:
+        for i in range(n):
+            gen = genome.Genome.from_arrays(config, [g[i] for g in genes], arrays["nutrition"][i], arrays["color"][i], rng=field.rng)
+            plant = plants.PlantCell(config, tuple(arrays["location"][i].tolist()), None, arrays["energy"][i], rng=field.rng, cache=field.think_cache, genes=gen)
+            plant.init_e = arrays["init_e"][i]
+            plant.age = int(arrays["age"][i])
+            field.entities.append(plant)
+
+    field.rng.bit_generator.state = meta["rng_state"]
+    return field
+
+
+def latest(directory):
+    """ path of the most recent complete checkpoint written by a Checkpointer
+
+    Args:
+        directory (string): directory of the Checkpointer
+
+    Returns:
+        string: path of the checkpoint, None if there is none
+    """
+    if not os.path.isdir(directory):
+        return None
+
+    # an interrupted write may have left only step_<age>.old, load() reads that
+    steps = [name[:-4] if name.endswith(".old") else name for name in os.listdir(directory) if name.startswith("step_") and not name.endswith(".tmp")]
+    if len(steps) == 0:
+        return None
+
+    return os.path.join(directory, max(steps))
+
+
+def validate(config, world_class, path, steps=20):
+    """ save and load a running world and check that it continues exactly like an uninterrupted copy
+
+    NB:
+    Two worlds with the same seed run for steps steps, one of them is saved
+    to path and loaded again, then both run for steps more steps. Plants are
+    compared sorted by location, as the backends keep them in different orders.
+
+    Args:
+        config (dictionary): global parameters of the world, needs an int config["seed"]
+        world_class (type): World class to check, e.g. domains.DistributedWorld
+        path (string): directory of the temporary checkpoint, removed at the end
+        steps (int, optional): steps before and after the checkpoint. Defaults to 20.
+
+    Returns:
+        dict: number of plants, and per state part whether the loaded run matches ("world_age", "plants", "grids")
+    """
+    original = world_class(config)
+    uninterrupted = world_class(config)
+    for _ in range(steps):
+        original.update()
+        uninterrupted.update()
+
+    save(original, path)
+    loaded = load(path)
+    shutil.rmtree(path)
+    for _ in range(steps):
+        loaded.update()
+        uninterrupted.update()
+
+    plants = []
+    for field in (loaded, uninterrupted):
+        locations, colors = field.get_plants()
+        order = np.lexsort((locations[:, 1], locations[:, 0]))
+        plants.append((locations[order], colors[order]))
+        field.flush_nutrients()
+
+    result = {
+        "num_plants" : len(plants[1][0]),
+        "world_age" : loaded.world_age == uninterrupted.world_age,
+        "plants" : all(np.array_equal(a, b) for a, b in zip(plants[0], plants[1])),
+        "grids" : all(np.array_equal(getattr(loaded, name), getattr(uninterrupted, name)) for name in GRIDS),
+    }
+
+    for field in (original, loaded, uninterrupted):
+        if hasattr(field, "close"): # DistributedWorld
+            field.close()
+    return result
+
+
+class Checkpointer():
+    def __init__(self, field, directory, every, keep=2):
+        """ periodic background checkpointing of a running world
+
+        NB:
+        Call step() after every World.update(). Every `every` steps the state
+        is copied (the only part that blocks the simulation) and written by a
+        background thread while the simulation continues.
+
+        Args:
+            field (World): world to checkpoint
+            directory (string): directory in which the checkpoints are kept as step_<world age>
+            every (int): checkpoint interval in steps
+            keep (int, optional): number of most recent checkpoints to keep. Defaults to 2.
+        """
+        self.field = field
+        self.directory = directory
+        self.every = every
+        self.keep = keep
+        self.thread = None
+
+        os.makedirs(self.directory, exist_ok=True)
+        return
+
+
+    def step(self):
+        """ checkpoint the world if its age is a multiple of the interval
+        """
+        if self.field.world_age % self.every == 0:
+            self.save()
+        return
+
+
+    def save(self):
+        """ snapshot the world now and write it in the background
+        """
+        self.wait() # at most one write in flight
+
+        arrays, meta = state(self.field)
+        path = os.path.join(self.directory, f"step_{self.field.world_age:010d}")
+
+        self.thread = threading.Thread(target=self._write, args=(arrays, meta, path), daemon=True)
+        self.thread.start()
+        return
+
+
+    def _write(self, arrays, meta, path):
+        write(arrays, meta, path)
+
+        # drop old checkpoints
+        steps = sorted(name for name in os.listdir(self.directory) if name.startswith("step_") and not name.endswith((".tmp", ".old")))
+        for name in steps[:-self.keep]:
+            shutil.rmtree(os.path.join(self.directory, name))
+        return
+
+
+    def wait(self):
+        """ block until the last background write finished
+        """
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        return
@@ -0,0 +1,110 @@
+import weakref
+
+
+class DecisionCache():
+    def __init__(self, energy_step=0.05, age_step=10, max_entries=64):
+        """ opt-in memoization of PlantCell.think
+
+        NB:
+        Of the 10 inputs of a plant only the energy and the age cost are
+        continuous, the 4 neighbour-life and 4 info bits are discrete. Entries are
+        keyed on the genome, the 8 discrete inputs, the energy bucket
+        (energy // energy_step) and the age bucket (age // age_step). An entry
+        holds the finished decisions of think(), so a hit skips the network pass
+        and the cleaning of its outputs; the key is a tuple of two ints and the
+        raw bytes of the 8 discrete inputs, far cheaper than the pass. The
+        cached arrays are shared by all hits and must not be modified.
+
+        This is NOT exact: a hit returns the decisions computed for the first
+        input that fell into the same buckets. The energy input of a hit can be
+        off by up to energy_step and the age cost input by up to
+        sun_energy * 1.1 * energy_cost_age * age_step (the age cost changes
+        fastest at age 0). Each layer is a linear map followed by tanh, so the
+        output error is at most the input error times the product of the weight
+        matrix norms, and outputs close to the 0.5 thresholds of reproduction and
+        info can flip. Choose smaller steps for accuracy, larger for hit rate.
+
+        It does NOT speed up the current network size: a lookup costs about a
+        quarter of a network pass, and in a stable colony of the default config
+        nearly every plant has its own genome, so the hit rate stays below
+        0.5. The think phase gets about 10 % faster, which is lost in the noise
+        of the whole update. It only pays off for larger networks.
+
+        Args:
+            energy_step (float, optional): width of the energy buckets. Defaults to 0.05.
+            age_step (int, optional): width of the age buckets in steps. Defaults to 10.
+            max_entries (int, optional): cached decisions per genome, the oldest is evicted. Defaults to 64.
+        """
+        self.energy_step = energy_step
+        self.age_step = age_step
+        self.max_entries = max_entries
+
+        # one dict per genome, in insertion order, entries disappear together with their genome
+        self.cache = weakref.WeakKeyDictionary()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        return
+
+
+    def get(self, genome, inputs, energy, age):
+        """ cached decisions of a plant
+
+        Args:
+            genome (Genome): genome of plant cell
+            inputs (np.array): the "sensory" inputs to a plant cell at a given moment
+            energy (float): energy of the plant cell, inputs[0]
+            age (int): age of the plant cell, which determines inputs[1]
+
+        Returns:
+            tuple(tuple, tuple): (key for put(), cached (decision, repr, send_e, set_inf) or None on a miss)
+        """
+        key = (int(energy // self.energy_step), age // self.age_step, inputs[2:].tobytes())
+
+        entries = self.cache.get(genome)
+        if entries is not None:
+            decisions = entries.get(key)
+            if decisions is not None:
+                self.hits += 1
+                return key, decisions
+
+        self.misses += 1
+        return key, None
+
+
+    def put(self, genome, key, decisions):
+        """ remember the decisions computed after a miss of get()
+
+        Args:
+            genome (Genome): genome of plant cell
+            key (tuple): key returned by get()
+            decisions (tuple): (decision, repr, send_e, set_inf) of PlantCell.think
+        """
+        entries = self.cache.get(genome)
+        if entries is None:
+            entries = {}
+            self.cache[genome] = entries
+
+        entries[key] = decisions
+        if len(entries) > self.max_entries:
+            del entries[next(iter(entries))]
+            self.evictions += 1
+        return
+
+
+    def stats(self):
+        """ hit-rate statistics of the cache
+
+        Returns:
+            dict: hits, misses, hit rate, evictions, cached genomes and cached entries
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits" : self.hits,
+            "misses" : self.misses,
+            "hit_rate" : self.hits / lookups if lookups > 0 else 0.0,
+            "evictions" : self.evictions,
+            "genomes" : len(self.cache),
+            "entries" : sum(len(entries) for entries in self.cache.values()),
+        }
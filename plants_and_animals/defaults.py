@@ -0,0 +1,53 @@
+import copy
+
+
+# the global parameters of a world, shared by main.py and sweep.py
+CONFIG = {
+    "pix_x" : 200,                          # width of the world in pixels
+    "pix_y" : 200,                          # height of the world in pixels
+    "num_nutrients" : 4,                    # number of different nutrients
+    "nutrient_restore" : 1e-5,              # restoration rate of nutrients on their own
+    "nutrient_greed" : 2e-3,                # amount of nutrients harvested each day, proportional to used energy
+    "lazy_nutrients" : True,                # only restore nutrients on tiles in use (call World.flush_nutrients before reading all of them)
+    "context_size" : 0,                     # currently meaningless
+    "starting_num" : 10000,                 # starting number of plants
+    "seed_mask" : None,                     # optional (pix_y, pix_x) density of the starting plants, e.g. utils.get_seed_mask(path, pix_x, pix_y)
+    "sun_energy" : 0.5,                     # amount of energy each day
+    "energy_cost_age" : 1e-3,               # tax on age, exponential accumulation, fraction of sun_energy
+    "energy_cost_dissipation" : 5e-3,       # like a tax on accumulated energy, it limits the amount of energy a cell can store, fraction of sun_energy
+    "death_chance" : 1e-6,                  # random chance of death of a plant at a time step
+    "reproduction_cost" : 2.0,              # amount of energy one must expend to create a new plant cell
+    "energy_sending_cost" : 0.4,            # when passing on energy, the fraction of energy lost
+    "info_sending_cost" : 0.01,             # when sending information, amount of energy lost
+    "genome_size" : [(10, 9), (9,9)],       # dimensions of decision genes, left most number input, right most output, neighboring nums must match [(X, Y), (Y, Z), (Z, A)]
+    "genome_mutation" : [1e-2, 1e-2, 1e-2], # mutation params: normal noise size, bitflip prob, reversal prob
+    "backend" : "objects",                  # "objects": one PlantCell per plant, "arrays": vectorized PlantPopulation, "domains": arrays split into tiles run by worker processes
+    "tiles" : (4, 1),                       # "domains" backend only: (tiles_y, tiles_x), one worker process per tile
+    "processes" : True,                     # "domains" backend only: False runs the tiles one after another in this process, same result, easier to debug
+    "precision" : "float64",                # "float32" halves the memory of genomes, energies and nutrients (see precision.validate for the drift)
+    "seed" : None,                          # seed of the world's random generator, set an int for reproducible runs
+    "profile" : True,                       # record per-phase timings of World.update, see World.profiler
+    "profile_history" : 1000,               # number of steps the timings are kept for
+    "think_cache" : None,                   # "objects" backend only: e.g. {"energy_step" : 0.05, "age_step" : 10, "max_entries" : 64} to memoize decisions (approximate, no speedup at the current network size, see DecisionCache)
+}
+
+
+def get_config(**overrides):
+    """ a copy of the default config with some values replaced
+
+    Args:
+        **overrides: config keys and the values to use instead of those of CONFIG
+
+    Returns:
+        dictionary: global parameters
+
+    Raises:
+        KeyError: raised for a key that is not in CONFIG
+    """
+    for key in overrides:
+        if key not in CONFIG:
+            raise KeyError("unknown config key " + str(key))
+
+    config = copy.deepcopy(CONFIG)
+    config.update(overrides)
+    return config
@@ -0,0 +1,465 @@
+import numpy as np
+import multiprocessing
+from multiprocessing import shared_memory
+import memory, population, reproduction, world
+
+
+GRIDS = ["life", "light", "infos", "energies", "nutrients", "nutrients_age"]
+
+
+def _tile_index(row_bounds, col_bounds):
+    """ owning tile row of every grid row and tile column of every grid column
+    """
+    row_tile = np.repeat(np.arange(len(row_bounds) - 1), np.diff(row_bounds))
+    col_tile = np.repeat(np.arange(len(col_bounds) - 1), np.diff(col_bounds))
+    return row_tile, col_tile
+
+
+class Tile():
+    def __init__(self, config, tile, row_bounds, col_bounds, grids):
+        """ the part of a DistributedWorld owned by one worker: a rectangle of the grid and the plants on it
+
+        NB:
+        A step has two halves. In decide() all plants of the tile make their
+        choices, reading the grids in place, which includes the one-cell halo
+        owned by the neighbouring tiles. Claims and sent energy that land on
+        another tile are returned to be handed to its owner. In merge() the tile
+        settles all claims on its own cells (its own and those of its
+        neighbours) and writes its own part of the grids. Between the halves all
+        tiles wait for each other, so every tile reads the state at the start of
+        the step and only ever writes its own rectangle.
+
+        Args:
+            config (dictionary): global parameters for the evolution
+            tile (int): index of the tile, row-major in the tile grid
+            row_bounds (list(int)): first row of every tile row, and pix_y at the end
+            col_bounds (list(int)): first column of every tile column, and pix_x at the end
+            grids (dict): name -> np.array of the full grids, shared by all tiles
+        """
+        self.config = config
+        self.tile = tile
+        self.world_age = 0
+
+        self.pix_y = self.config["pix_y"]
+        self.pix_x = self.config["pix_x"]
+        self.tiles_x = len(col_bounds) - 1
+        ty, tx = divmod(tile, self.tiles_x)
+        self.y0, self.y1 = row_bounds[ty], row_bounds[ty + 1]
+        self.x0, self.x1 = col_bounds[tx], col_bounds[tx + 1]
+
+        self.row_tile, self.col_tile = _tile_index(row_bounds, col_bounds)
+
+        for name in GRIDS:
+            setattr(self, name, grids[name])
+        self.lazy_nutrients = self.config.get("lazy_nutrients", False)
+
+        # independent random stream per tile, reproducible via config["seed"]
+        seed = self.config.get("seed")
+        self.rng = np.random.default_rng(None if seed is None else [seed, tile])
+
+        # priorities are random keys made distinct by the cell of the plant
+        self.cells = self.pix_y * self.pix_x
+        self.max_key = np.iinfo(np.int64).max // self.cells
+
+        self.population = population.PlantPopulation(self.config, capacity=1024, rng=self.rng)
+        self.pending = None # own claims between decide() and merge()
+        return
+
+
+    def owner(self, y, x):
+        """ tile owning each of the given cells
+
+        Args:
+            y (np.array): y coordinates
+            x (np.array): x coordinates
+
+        Returns:
+            np.array: tile index per cell
+        """
+        return self.row_tile[y] * self.tiles_x + self.col_tile[x]
+
+
+    def seed(self, locations):
+        """ create the starting plants of the tile
+
+        Args:
+            locations (np.array): (k, 2) array of (y, x) locations, all on this tile
+        """
+        self.population.seed(locations, energy=1)
+        return
+
+
+    def restore_nutrients(self, y, x):
+        """ bring the nutrients of the given tiles up to date, see World.restore_nutrients
+        """
+        steps = self.world_age - self.nutrients_age[y, x]
+        self.nutrients[y, x] += (steps * self.config["nutrient_restore"])[..., None]
+        self.nutrients_age[y, x] = self.world_age
+        return
+
+
+    def decide(self):
+        """ first half of a step, the choices of all plants of the tile
+
+        Returns:
+            dict: tile -> claims on and energy sent to cells of that tile, for all other tiles concerned
+        """
+        self.world_age += 1
+        pop = self.population
+        n = pop.size
+        y = pop.location[:n, 0]
+        x = pop.location[:n, 1]
+
+        if self.lazy_nutrients:
+            self.restore_nutrients(y, x)
+        else:
+            self.restore_nutrients(slice(self.y0, self.y1), slice(self.x0, self.x1))
+
+        key = self.rng.integers(0, self.max_key, size=n) # set random update order
+        priority = key * self.cells + y * self.pix_x + x
+        dead = self.rng.uniform(size=n) < self.config["death_chance"] # random deaths
+
+        repr, send_e, set_inf = pop.choices(self.light[y, x], self.life, self.infos, self.nutrients)
+        dead |= ~pop.alive[:n]
+
+        # all claims and energy sends, split by the tile they land on
+        ny, nx = pop.neighbours()
+        parents, direction = np.nonzero(repr == 1)
+        cy = ny[parents, direction]
+        cx = nx[parents, direction]
+        claim_owner = self.owner(cy, cx)
+        energy_owner = self.owner(ny, nx)
+
+        own = claim_owner == self.tile
+        own_e = energy_owner == self.tile
+        self.pending = {
+            "priority" : priority, "dead" : dead, "set_inf" : set_inf,
+            "parents" : parents[own], "direction" : direction[own], "y" : cy[own], "x" : cx[own],
+            "energy_y" : ny[own_e], "energy_x" : nx[own_e], "energy" : send_e[own_e],
+        }
+
+        outgoing = {}
+        for dest in np.unique(np.concatenate([claim_owner, energy_owner.ravel()])):
+            if dest == self.tile:
+                continue
+            sel = claim_owner == dest
+            sel_e = energy_owner == dest
+            slots = pop.genome_slot[parents[sel]]
+            outgoing[int(dest)] = {
+                "priority" : priority[parents[sel]], "direction" : direction[sel], "y" : cy[sel], "x" : cx[sel],
+                "genes" : pop.genomes.get_normal_genes(slots), "nutrition" : pop.genomes.nutrition[slots],
+                "energy_y" : ny[sel_e], "energy_x" : nx[sel_e], "energy" : send_e[sel_e],
+            }
+        return outgoing
+
+
+    def merge(self, incoming):
+        """ second half of a step, settle all claims on the tile and write its part of the grids
+
+        NB:
+        Claims from other tiles are settled together with the own ones by
+        reproduction.settle, i.e. the lowest priority valid claim on a cell wins
+        no matter which tile it comes from. A winning claim from another tile
+        brings the genome of its parent along, the child is created here.
+        Energy sent across the boundary is added like energy sent within.
+
+        Args:
+            incoming (list(dict)): what the other tiles returned for this tile from decide()
+
+        Returns:
+            dict: births, deaths and population of the tile, and the changed cells with their new colors (see World.take_changes)
+        """
+        pop = self.population
+        p = self.pending
+        n = pop.size
+        y = pop.location[:n, 0]
+        x = pop.location[:n, 1]
+        dead = p["dead"]
+        priority = p["priority"]
+
+        # all claims on this tile, own ones first
+        msgs = [p] + incoming
+        cy = np.concatenate([m["y"] for m in msgs])
+        cx = np.concatenate([m["x"] for m in msgs])
+        direction = np.concatenate([m["direction"] for m in msgs])
+        claim_priority = np.concatenate([priority[p["parents"]]] + [m["priority"] for m in incoming])
+
+        targets = cy * self.pix_x + cx
+        winners = reproduction.settle(targets, claim_priority, direction, self.life[cy, cx] != 0, (y * self.pix_x + x)[dead], priority[dead])
+
+        # spread energy within the tile
+        h, w = self.y1 - self.y0, self.x1 - self.x0
+        ey = np.concatenate([m["energy_y"] for m in msgs]) - self.y0
+        ex = np.concatenate([m["energy_x"] for m in msgs]) - self.x0
+        energy = np.concatenate([m["energy"] for m in msgs])
+        self.energies[self.y0:self.y1, self.x0:self.x1] = np.bincount((ey * w + ex).ravel(), weights=energy.ravel(), minlength=h * w).reshape(h, w)
+
+        # set plant info, update life
+        self.infos[self.y0:self.y1, self.x0:self.x1] = 0
+        self.infos[y, x] = p["set_inf"]
+        self.life[y[dead], x[dead]] = 0
+        self.life[cy[winners], cx[winners]] = 1
+
+        # parents of the births, genomes from other tiles get a temporary slot
+        arena = pop.genomes
+        num_own = len(p["parents"])
+        own = winners < num_own
+        parent_slots = np.empty(len(winners), dtype=np.int64)
+        parent_slots[own] = pop.genome_slot[p["parents"][winners[own]]]
+
+        remote = winners[~own] - num_own
+        temp = arena.allocate(len(remote))
+        if len(remote) > 0:
+            for i, genes in enumerate(arena.normal_genes):
+                genes[temp] = np.concatenate([m["genes"][i] for m in incoming])[remote]
+            arena.nutrition[temp] = np.concatenate([m["nutrition"] for m in incoming])[remote]
+        parent_slots[~own] = temp
+
+        # add new plants, remove killed ones
+        children = arena.spawn(parent_slots)
+        arena.release(temp)
+        born = np.stack([cy[winners], cx[winners]], axis=1)
+        died = np.stack([y[dead], x[dead]], axis=1)
+        pop.add(born, children, energy=1.0)
+        pop.remove(np.concatenate([dead, np.zeros(len(winners), dtype=bool)]))
+
+        self.pending = None
+        changes = (died, born, arena.color[children])
+        return {"births" : len(winners), "deaths" : int(np.sum(dead)), "population" : pop.size, "changes" : changes}
+
+
+    def get_plants(self):
+        """ locations and colors of the plants of the tile, see World.get_plants
+        """
+        pop = self.population
+        return pop.location[:pop.size].copy(), pop.genomes.color[pop.genome_slot[:pop.size]]
+
+
+    def state(self):
+        """ the plants of the tile as columns and the state of its random generator, see checkpoint.state
+        """
+        return self.population.get_columns(), self.rng.bit_generator.state
+
+
+    def restore(self, columns, rng_state, world_age):
+        """ add plants from columns and continue the random stream where it was saved, see checkpoint.load
+        """
+        self.population.add_columns(columns)
+        self.rng.bit_generator.state = rng_state
+        self.world_age = world_age
+        return
+
+
+    def report(self):
+        """ memory of the plants of the tile, see memory.population_report
+        """
+        return memory.population_report(self.population)
+
+
+
+def _work(conn, config, tile, row_bounds, col_bounds, specs, locations):
+    """ main loop of a worker process, runs the commands of its DistributedWorld on one Tile
+    """
+    blocks = {name: shared_memory.SharedMemory(name=spec[0]) for name, spec in specs.items()} # cleaned up by the DistributedWorld
+    grids = {name: np.ndarray(specs[name][1], dtype=specs[name][2], buffer=blocks[name].buf) for name in specs}
+
+    part = Tile(config, tile, row_bounds, col_bounds, grids)
+    part.seed(locations)
+
+    while True:
+        cmd, arg = conn.recv()
+        if cmd == "close":
+            break
+        conn.send(getattr(part, cmd)(*arg))
+
+    del part, grids
+    for block in blocks.values():
+        block.close()
+    conn.close()
+    return
+
+
+class DistributedWorld(world.World):
+    """ World split into rectangular tiles, each run by its own worker process
+
+    NB:
+    The grids live in shared memory, every worker owns the plants on one tile
+    (see Tile). config["tiles"] = (tiles_y, tiles_x) sets the decomposition,
+    by default one row of tiles per core. A step runs the decide() half on all
+    tiles in parallel, hands the claims and energy crossing a tile boundary to
+    the owning tile and runs the merge() half in parallel, so per step only
+    the boundary traffic goes through the main process.
+
+    Plants behave as in ArrayWorld (start-of-step sensing, births settled by
+    random priority), but every tile draws from its own random stream, so a run
+    is reproducible for a fixed seed and decomposition only. With
+    config["processes"] = False the tiles run one after another in this
+    process, which gives the same result and is easier to debug. Call close()
+    to stop the workers and free the shared memory.
+    """
+    phases = ["decide", "exchange", "merge"]
+
+    def _seed(self, locations):
+        """ move the grids into shared memory and start one worker per tile
+
+        Args:
+            locations (np.array): (N, 2) array of (y, x) locations of the starting plants
+        """
+        self.blocks = {}
+        specs = {}
+        for name in GRIDS:
+            arr = getattr(self, name)
+            block = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+            shared = np.ndarray(arr.shape, dtype=arr.dtype, buffer=block.buf)
+            shared[...] = arr
+            setattr(self, name, shared)
+            self.blocks[name] = block
+            specs[name] = (block.name, arr.shape, arr.dtype.str)
+
+        tiles_y, tiles_x = self.config.get("tiles", (multiprocessing.cpu_count(), 1))
+        row_bounds = [i * self.pix_y // tiles_y for i in range(tiles_y + 1)]
+        col_bounds = [i * self.pix_x // tiles_x for i in range(tiles_x + 1)]
+        self.row_tile, self.col_tile = _tile_index(row_bounds, col_bounds)
+        self.tiles_x = tiles_x
+        owner = self.owner(locations)
+
+        self.num_tiles = tiles_y * tiles_x
+        self.processes = self.config.get("processes", True)
+        self.tiles = []
+        self.workers = []
+        for tile in range(self.num_tiles):
+            tile_locations = locations[owner == tile]
+            if self.processes:
+                conn, child = multiprocessing.Pipe()
+                proc = multiprocessing.Process(target=_work, args=(child, self.config, tile, row_bounds, col_bounds, specs, tile_locations), daemon=True)
+                proc.start()
+                self.workers.append((proc, conn))
+            else:
+                part = Tile(self.config, tile, row_bounds, col_bounds, {name: getattr(self, name) for name in GRIDS})
+                part.seed(tile_locations)
+                self.tiles.append(part)
+        return
+
+
+    def owner(self, locations):
+        """ tile owning each of the given cells
+
+        Args:
+            locations (np.array): (N, 2) array of (y, x) locations
+
+        Returns:
+            np.array: tile index per cell
+        """
+        return self.row_tile[locations[:, 0]] * self.tiles_x + self.col_tile[locations[:, 1]]
+
+
+    def _call(self, cmd, args=None):
+        """ run a Tile method on all tiles, in parallel if they run in workers
+
+        Args:
+            cmd (string): name of the method
+            args (list(tuple), optional): arguments per tile. Defaults to None.
+
+        Returns:
+            list: result per tile
+        """
+        args = [()] * self.num_tiles if args is None else args
+        if not self.processes:
+            return [getattr(part, cmd)(*arg) for part, arg in zip(self.tiles, args)]
+
+        for (_, conn), arg in zip(self.workers, args):
+            conn.send((cmd, arg))
+        return [conn.recv() for _, conn in self.workers]
+
+
+    def get_plants(self):
+        """ returns locations and colors of all living plants, e.g. for rendering
+
+        Returns:
+            tuple(np.array, np.array): (N, 2) array of (y, x) locations and (N, 3) array of RGB colors
+        """
+        parts = self._call("get_plants")
+        return np.concatenate([loc for loc, _ in parts]), np.concatenate([col for _, col in parts])
+
+
+    def get_state(self):
+        """ the plants of all tiles as columns, e.g. for checkpoint.state
+
+        Returns:
+            tuple(dict, list): name -> array of all plants (see PlantPopulation.get_columns), and the state of the random generator of every tile
+        """
+        parts = self._call("state")
+        columns = {name: np.concatenate([cols[name] for cols, _ in parts]) for name in parts[0][0]}
+        return columns, [rng_state for _, rng_state in parts]
+
+
+    def set_state(self, columns, rng_states):
+        """ hand plants to the tiles owning their cells, e.g. from checkpoint.load
+
+        NB: the tiles must be empty, e.g. a world created with starting_num = 0
+
+        Args:
+            columns (dict): name -> array of all plants, see get_state()
+            rng_states (list): state of the random generator of every tile, see get_state()
+        """
+        owner = self.owner(np.asarray(columns["location"]))
+        args = []
+        for tile in range(self.num_tiles):
+            mine = owner == tile
+            args.append(({name: np.asarray(col)[mine] for name, col in columns.items()}, rng_states[tile], self.world_age))
+        self._call("restore", args)
+        return
+
+
+    def population_report(self):
+        """ memory of the plants of all tiles, see memory.population_report
+        """
+        parts = self._call("report")
+        return {key: sum(part[key] for part in parts) for key in parts[0]}
+
+
+    def update(self):
+        """ update all life in the world at one time step, see Tile
+        """
+        self.profiler.start()
+        self.world_age += 1
+
+        outgoing = self._call("decide")
+        self.profiler.mark("decide")
+
+        # hand everything that crosses a boundary to the owning tile
+        incoming = [[] for _ in range(self.num_tiles)]
+        for out in outgoing:
+            for dest, msg in out.items():
+                incoming[dest].append(msg)
+        self.profiler.mark("exchange")
+
+        stats = self._call("merge", [(msgs,) for msgs in incoming])
+        self.profiler.mark("merge")
+
+        for died, born, colors in (s["changes"] for s in stats):
+            self._log_changes(died)
+        for died, born, colors in (s["changes"] for s in stats):
+            self._log_changes(born, colors)
+
+        for name in self.counters:
+            self.profiler.count(name, sum(s[name] for s in stats))
+        self.profiler.stop()
+        return
+
+
+    def close(self):
+        """ stop the workers and free the shared memory
+        """
+        for proc, conn in self.workers:
+            conn.send(("close", None))
+            proc.join()
+        self.workers = []
+
+        for name in GRIDS: # drop the views before closing their memory
+            setattr(self, name, np.array(getattr(self, name)))
+        for block in self.blocks.values():
+            block.close()
+            block.unlink()
+        self.blocks = {}
+        return
@@ -1,29 +1,33 @@
 from abc import abstractmethod, ABC
 import numpy as np
+import precision
 
 class Genome(ABC):
-    def __init__(self, config, parent_genes=None):
+    def __init__(self, config, parent_genes=None, rng=None):
         """ init a Genome
 
         Args:
             config (dictionary): dictionary set in main, which marks global parameters
             parent_genes (Genome, optional): Genome of the parent plant. Defaults to None.
             shapes (list(tuple), optional): If Genome of parent is None, initialize choice genes using shapes (ignored otherwise). Defaults to None.
+            rng (np.random.Generator, optional): source of randomness, if None the global np.random state is used. Defaults to None.
         """
+        self.rng = np.random if rng is None else rng
 
         self.var = config["genome_mutation"] # list of hyperparameters used in the mutation_func
         self.num_nutrients = config["num_nutrients"] # size of nutrient vector
-            
+        self.dtype = precision.get_dtype(config)
+
         
         if parent_genes is None:
 
             # initialize choice genes
             self.normal_genes = []
             for shp in config["genome_size"]:
-                self.normal_genes.append(np.random.uniform(low=-1, high=1, size=shp))
+                self.normal_genes.append(self.rng.uniform(low=-1, high=1, size=shp).astype(self.dtype))
 
             # initialize and normalize nutrition genes
-            self.nutrition = np.random.uniform(low=0, high=1, size=self.num_nutrients)
+            self.nutrition = self.rng.uniform(low=0, high=1, size=self.num_nutrients).astype(self.dtype)
             self.nutrition /= np.sum(self.nutrition)
 
         else:
@@ -42,7 +46,33 @@ class Genome(ABC):
         self.color = self.compute_color()
 
         return
-    
+
+
+    @classmethod
+    def from_arrays(cls, config, normal_genes, nutrition, color, rng=None):
+        """ rebuild a Genome from stored genes without drawing random numbers, e.g. from a checkpoint
+
+        Args:
+            config (dictionary): dictionary set in main, which marks global parameters
+            normal_genes (list(np.array)): decision genes, one matrix per layer
+            nutrition (np.array): nutrition genes
+            color (tuple): RGB code of the genome
+            rng (np.random.Generator, optional): source of randomness for mutations of descendants. Defaults to None.
+
+        Returns:
+            Genome: the genome
+        """
+        self = cls.__new__(cls)
+        self.rng = np.random if rng is None else rng
+        self.var = config["genome_mutation"]
+        self.num_nutrients = config["num_nutrients"]
+        self.dtype = precision.get_dtype(config)
+
+        self.normal_genes = [np.array(genes, dtype=self.dtype) for genes in normal_genes]
+        self.nutrition = np.array(nutrition, dtype=self.dtype)
+        self.color = tuple(int(c) for c in color)
+        return self
+
 
     def compute_color(self):
         """ compute the color based on the genes to vaguely indicate how closely
@@ -89,10 +119,10 @@ class Genome(ABC):
             np.array: varied version of np.array
         """
         x = input.copy()
-        x += np.random.normal(scale=self.var[0], size=input.shape)
+        x += self.rng.normal(scale=self.var[0], size=input.shape)
 
-        if np.random.uniform() < self.var[1]:
-            random_index = np.random.choice(x.size)
+        if self.rng.uniform() < self.var[1]:
+            random_index = self.rng.choice(x.size)
             idx = np.unravel_index(random_index, x.shape)
 
             # Modify the randomly selected element
@@ -108,3 +138,218 @@ class Genome(ABC):
         #     # x[indices] = x[next_indices]
 
         return x
+
+
+class GenomeArena():
+    def __init__(self, config, capacity=1024, rng=None):
+        """ contiguous storage for the genomes of a whole population
+
+        NB:
+        Every genome occupies one slot, i.e. one row in each of the preallocated
+        per-layer arrays. Slots of dead plants are put on a free list and reused
+        by the next children, so births do not allocate as long as the capacity
+        suffices (it doubles otherwise).
+
+        Args:
+            config (dictionary): dictionary set in main, which marks global parameters
+            capacity (int, optional): number of genomes to preallocate room for. Defaults to 1024.
+            rng (np.random.Generator, optional): source of randomness, if None the global np.random state is used, as in Genome. Defaults to None.
+        """
+        self.rng = np.random if rng is None else rng
+        self.var = config["genome_mutation"] # list of hyperparameters used in the mutation_func
+        self.num_nutrients = config["num_nutrients"] # size of nutrient vector
+        self.shapes = [tuple(shp) for shp in config["genome_size"]]
+        self.dtype = precision.get_dtype(config)
+
+        self.normal_genes = [np.zeros((capacity,) + shp, dtype=self.dtype) for shp in self.shapes]
+        self.nutrition = np.zeros((capacity, self.num_nutrients), dtype=self.dtype)
+        self.color = np.zeros((capacity, 3), dtype=np.uint8)
+
+        # stack of free slots, the next slot to hand out is at the end
+        self.free = np.arange(capacity)[::-1].copy()
+        self.num_free = capacity
+        return
+
+
+    def _grow(self, needed):
+        """ reallocate the arena such that at least needed more genomes fit
+
+        Args:
+            needed (int): number of slots that must be free after growing
+        """
+        old_capacity = len(self.nutrition)
+        capacity = old_capacity
+        while capacity - old_capacity + self.num_free < needed:
+            capacity *= 2
+
+        for i, old in enumerate(self.normal_genes):
+            self.normal_genes[i] = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            self.normal_genes[i][:old_capacity] = old
+
+        for name in ["nutrition", "color"]:
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:old_capacity] = old
+            setattr(self, name, new)
+
+        # the free stack can hold every slot, new slots go on top
+        free = np.empty(capacity, dtype=self.free.dtype)
+        free[:self.num_free] = self.free[:self.num_free]
+        free[self.num_free:self.num_free + capacity - old_capacity] = np.arange(old_capacity, capacity)[::-1]
+        self.free = free
+        self.num_free += capacity - old_capacity
+        return
+
+
+    def allocate(self, k):
+        """ take k slots from the free list
+
+        Args:
+            k (int): number of slots
+
+        Returns:
+            np.array: indices of the allocated slots
+        """
+        if k > self.num_free:
+            self._grow(k)
+
+        self.num_free -= k
+        return self.free[self.num_free:self.num_free + k][::-1].copy()
+
+
+    def release(self, slots):
+        """ return slots to the free list, their contents become meaningless
+
+        Args:
+            slots (np.array): indices of the slots to release
+        """
+        k = len(slots)
+        self.free[self.num_free:self.num_free + k] = slots
+        self.num_free += k
+        return
+
+
+    def seed(self, k):
+        """ create k random genomes, as Genome does without parent
+
+        Args:
+            k (int): number of genomes
+
+        Returns:
+            np.array: slots of the new genomes
+        """
+        slots = self.allocate(k)
+
+        # initialize choice genes
+        children = [self.rng.uniform(low=-1, high=1, size=(k,) + shp).astype(self.dtype) for shp in self.shapes]
+        for genes, child in zip(self.normal_genes, children):
+            genes[slots] = child
+
+        # initialize and normalize nutrition genes
+        nutrition = self.rng.uniform(low=0, high=1, size=(k, self.num_nutrients))
+        self.nutrition[slots] = nutrition / np.sum(nutrition, axis=1, keepdims=True)
+
+        self.color[slots] = self.compute_color(children)
+        return slots
+
+
+    def spawn(self, parent_slots):
+        """ create one mutated child genome per parent slot, as Genome does with parent
+
+        Args:
+            parent_slots (np.array): slot of the parent of each child, may repeat
+
+        Returns:
+            np.array: slots of the children
+        """
+        k = len(parent_slots)
+        slots = self.allocate(k)
+
+        # draw the randomness of the whole batch at once, columns are split among the genome parts
+        sizes = [int(np.prod(shp)) for shp in self.shapes] + [self.num_nutrients]
+        noise = np.split(self.rng.normal(scale=self.var[0], size=(k, sum(sizes))).astype(self.dtype), np.cumsum(sizes)[:-1], axis=1)
+        flips = self.rng.uniform(size=(k, 2, len(sizes)))
+
+        # vary choice genome based on parent
+        children = []
+        for i, genes in enumerate(self.normal_genes):
+            children.append(self.mutation_func(genes[parent_slots], noise[i], flips[:, :, i]))
+            genes[slots] = children[-1]
+
+        # vary and normalize nutrition genome based on parent
+        nutrition = self.mutation_func(self.nutrition[parent_slots], noise[-1], flips[:, :, -1])
+        self.nutrition[slots] = nutrition / np.sum(np.abs(nutrition), axis=1, keepdims=True)
+
+        self.color[slots] = self.compute_color(children)
+        return slots
+
+
+    def compute_color(self, normal_genes):
+        """ compute the colors of a batch of genomes, see Genome.compute_color
+
+        NB:
+        The genes are not concatenated, instead each third of the flattened
+        gene array is summed up piecewise from the layers it overlaps.
+
+        Args:
+            normal_genes (list(np.array)): one (k, in, out) array per layer
+
+        Returns:
+            np.array: (k, 3) uint8 array of RGB codes
+        """
+        k = len(normal_genes[0])
+        flat = [genes.reshape(k, int(np.prod(genes.shape[1:]))) for genes in normal_genes]
+        lga = int(sum(f.shape[1] for f in flat)/3)
+
+        sums = np.zeros((k, 3))
+        offset = 0
+        for f in flat:
+            for idx in range(3):
+                lo = max(idx*lga - offset, 0)
+                hi = min((idx+1)*lga - offset, f.shape[1])
+                if lo < hi:
+                    sums[:, idx] += np.sum(np.abs(f[:, lo:hi]), axis=1)
+            offset += f.shape[1]
+
+        return ((2 * sums / lga * 255).astype(np.int64) % 256).astype(np.uint8)
+
+
+    def get_normal_genes(self, slots):
+        """ returns the stacked decision genes of the given genomes
+
+        Args:
+            slots (np.array): slots of the genomes
+
+        Returns:
+            list: one (k, in, out) array per layer, as used by activations.batch_network
+        """
+        return [genes[slots] for genes in self.normal_genes]
+
+
+    def mutation_func(self, input, noise, uniforms):
+        """ batched version of Genome.mutation_func, mutating every row independently
+
+        NB:
+        The random numbers are passed in, such that spawn can draw them for
+        all genome parts of a batch in one call.
+
+        Args:
+            input (np.array): (k, ...) array, one genome part per row
+            noise (np.array): (k, input[0].size) normal noise of scale var[0]
+            uniforms (np.array): (k, 2) uniform numbers deciding whether and where to flip
+
+        Returns:
+            np.array: varied version of np.array
+        """
+        k = len(input)
+        size = int(np.prod(input.shape[1:]))
+        x = input + noise.reshape(input.shape)
+
+        flat = x.reshape(k, size)
+        flip = np.flatnonzero(uniforms[:, 0] < self.var[1])
+        random_index = (uniforms[flip, 1] * size).astype(np.int64)
+
+        # Modify the randomly selected elements
+        flat[flip, random_index] = 1 - flat[flip, random_index]
+
+        return x
@@ -1,40 +1,35 @@
 import pygame
 import numpy as np
-import sys
-import time
-import world
+import sys, os
+import world, profiler, memory, domains, defaults
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "common"))
+import recorder, renderer, runner, viewport
 
 # SET SOME PARAMS HERE
 SCREEN_SIZE_X = 800
 SCREEN_SIZE_Y = 800
 SIM_PIX_SIZE = 4
-UPDATE_TIME = 0 # seconds
+FPS = 30 # displayed frames per second
+STEPS_PER_FRAME = None # simulation steps per displayed frame, None to simulate as fast as possible
+RECORD = None # directory to record the run to, replay with common/recorder.py
 
 num_sim_pix_x = SCREEN_SIZE_X // SIM_PIX_SIZE
 num_sim_pix_y = SCREEN_SIZE_Y // SIM_PIX_SIZE
 
-# SET OTHER PARAMS HERE
-config = {
-    "pix_x" : num_sim_pix_x,
-    "pix_y" : num_sim_pix_y,
-    "num_nutrients" : 4,                    # number of different nutrients
-    "nutrient_restore" : 1e-5,              # restoration rate of nutrients on their own
-    "nutrient_greed" : 2e-3,                # amount of nutrients harvested each day, proportional to used energy
-    "context_size" : 0,                     # currently meaningless
-    "starting_num" : 10000,                 # starting number of plants
-    "sun_energy" : 0.5,                     # amount of energy each day
-    "energy_cost_age" : 1e-3,               # tax on age, exponential accumulation, fraction of sun_energy
-    "energy_cost_dissipation" : 5e-3,       # like a tax on accumulated energy, it limits the amount of energy a cell can store, fraction of sun_energy
-    "death_chance" : 1e-6,                  # random chance of death of a plant at a time step
-    "reproduction_cost" : 2.0,              # amount of energy one must expend to create a new plant cell
-    "energy_sending_cost" : 0.4,            # when passing on energy, the fraction of energy lost
-    "info_sending_cost" : 0.01,             # when sending information, amount of energy lost
-    "genome_size" : [(10, 9), (9,9)],       # dimensions of decision genes, left most number input, right most output, neighboring nums must match [(X, Y), (Y, Z), (Z, A)]
-    "genome_mutation" : [1e-2, 1e-2, 1e-2]  # mutation params: normal noise size, bitflip prob, reversal prob
-}
-
-field = world.World(config)
-WHITE = np.array([255, 255, 255])
+# SET OTHER PARAMS HERE, see defaults.py for all of them and what they do
+config = defaults.get_config(
+    pix_x=num_sim_pix_x,
+    pix_y=num_sim_pix_y,
+)
+
+if config["backend"] == "arrays":
+    field = world.ArrayWorld(config)
+elif config["backend"] == "domains":
+    field = domains.DistributedWorld(config)
+else:
+    field = world.World(config)
+print(memory.format_report(memory.report(field)))
+rec = recorder.Recorder(RECORD) if RECORD is not None else None
 
 
 pygame.init()
@@ -42,37 +37,62 @@ screen = pygame.display.set_mode((SCREEN_SIZE_X, SCREEN_SIZE_Y))
 pygame.display.set_caption("The Secret Life of Pixels")
 
 
-running = True
+render_profiler = profiler.Profiler(["render"], [], history=config["profile_history"], enabled=config["profile"])
 
-update_time = []
-render_time = []
 
-while running:
-    time.sleep(UPDATE_TIME)
-    update_start = time.process_time()
+def step():
     field.update()
-    update_time.append(time.process_time() - update_start)
-
-    render_start = time.process_time()
-    screen.fill((0,0,0))
-
-    pix_colors = np.zeros((num_sim_pix_y, num_sim_pix_x, 3))
-
-    # print("-"*50)
+    if rec is not None:
+        rec.step(field)
 
-    for elem in field.entities:
-        y, x = elem.location
-        screen_x = x * SIM_PIX_SIZE
-        screen_y = y * SIM_PIX_SIZE
-        # Calculate the position of the simulated pixel on the screen
+    if field.world_age % 100 == 0:
+        print("-"*50)
+        print("world age: ", field.world_age, ", num plants", int(np.sum(field.life)), f", world cost {1.1 * (1 - np.exp(-field.config['energy_cost_age'] * field.world_age)):.2f}")
+        print(f"simulation: {sim.steps_per_sec():.1f} steps/s")
+        if config["profile"]:
+            print("update", field.profiler.report())
+            if render_profiler.steps > 0:
+                print("render time: mean", render_profiler.summary()["render"]["mean"])
+        if getattr(field, "think_cache", None) is not None:
+            print("think cache:", field.think_cache.stats())
+
+# the world image and its zoomed out levels, updated in the simulation thread
+pyramid = viewport.Pyramid((num_sim_pix_y, num_sim_pix_x), reduce="max")
+view = viewport.Viewport((num_sim_pix_y, num_sim_pix_x), (SCREEN_SIZE_X, SCREEN_SIZE_Y), zoom=SIM_PIX_SIZE)
+
+def snapshot():
+    # only the cells with births and deaths since the last snapshot, all plants the first time
+    changes = field.take_changes()
+    if changes is None:
+        locations, colors = field.get_plants()
+        image = renderer.from_plants((num_sim_pix_y, num_sim_pix_x), locations, colors)
+
+    with pyramid.lock:
+        if changes is None:
+            pyramid.set(image)
+        else:
+            pyramid.set_cells(*changes)
+        pyramid.refresh()
+    return True
+
+
+# the simulation runs in its own thread, the display shows its snapshots at FPS
+sim = runner.Runner(step, snapshot, steps_per_frame=STEPS_PER_FRAME)
+canvas = renderer.Renderer(screen, 1)
+clock = pygame.time.Clock()
+running = True
+shown = None # view of the last drawn frame
 
-        pc = elem.genome.color
-        # pix_colors[y,x] += np.array([0,255,0])
-        pygame.draw.rect(screen, pc, (screen_x, screen_y, SIM_PIX_SIZE, SIM_PIX_SIZE))
+sim.start()
+while running:
+    new = sim.frame() is not None
 
+    render_profiler.start()
+    if new or view.view != shown:
+        # the visible part of the world at screen resolution, drag / wheel / arrows / +- to pan and zoom
+        shown = view.view
+        canvas.draw(view.render(pyramid))
 
-        # Draw the simulated pixel on the screen
-    
     # for y in range(num_sim_pix_y):
     #     for x in range(num_sim_pix_x):
     #         screen_x = x * SIM_PIX_SIZE
@@ -94,14 +114,18 @@ while running:
     for event in pygame.event.get():
         if event.type == pygame.QUIT:
             running = False
+        view.handle(event)
 
-    pygame.display.flip()
-    render_time.append(time.process_time() - render_start)
+    canvas.present()
+    render_profiler.mark("render")
+    render_profiler.stop()
 
-    if field.world_age % 100 == 0:
-        print("-"*50)
-        print("world age: ", field.world_age, ", num plants", len(field.entities), f", world cost {1.1 * (1 - np.exp(-field.config['energy_cost_age'] * field.world_age)):.2f}")
-        print("update time: mean", np.mean(update_time), ", total", np.sum(update_time))
+    clock.tick(FPS)
 
+sim.stop()
+if rec is not None:
+    rec.close()
+if config["backend"] == "domains":
+    field.close()
 pygame.quit()
 sys.exit()
\ No newline at end of file
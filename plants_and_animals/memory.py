@@ -0,0 +1,173 @@
+import sys
+import world, precision
+
+
+def object_bytes(obj):
+    """ resident bytes of a python object and its attribute dict (not following references)
+
+    Args:
+        obj (object): any object
+
+    Returns:
+        int: bytes
+    """
+    size = sys.getsizeof(obj)
+    if hasattr(obj, "__dict__"):
+        size += sys.getsizeof(obj.__dict__)
+    return size
+
+
+def grid_report(field):
+    """ bytes of every full-grid array of a world
+
+    Args:
+        field (World): world to measure
+
+    Returns:
+        dict: bytes per grid
+    """
+    grids = ["life", "light", "infos", "energies", "nutrients", "nutrients_age"]
+    return {name: getattr(field, name).nbytes for name in grids}
+
+
+def population_report(pop):
+    """ bytes of the plants of a PlantPopulation, see report()
+
+    Args:
+        pop (PlantPopulation): population to measure
+
+    Returns:
+        dict: bytes of "entities", "genomes" and "scratch", and the number of plants
+    """
+    rep = {"entities" : 0, "genomes" : 0, "scratch" : 0}
+    for name in pop._state_arrays():
+        part = "scratch" if name in ("inputs", "decision") else "entities"
+        rep[part] += getattr(pop, name).nbytes
+
+    arena = pop.genomes
+    rep["genomes"] = sum(genes.nbytes for genes in arena.normal_genes) + arena.nutrition.nbytes + arena.color.nbytes + arena.free.nbytes
+    rep["num_plants"] = pop.size
+    return rep
+
+
+def report(field):
+    """ break the resident memory of a world down by subsystem
+
+    NB:
+    "entities" is the per-plant state (PlantCell objects, or the state arrays of
+    the PlantPopulation), "genomes" the genomes, "scratch" the per-plant
+    inputs, decision and context arrays. Arrays of an ArrayWorld are counted
+    with their full capacity, which is what is actually allocated. The plants
+    of a DistributedWorld are summed over its tiles.
+
+    Args:
+        field (World): world to measure
+
+    Returns:
+        dict: bytes per subsystem, grids broken down per grid, and the number of plants
+    """
+    rep = {"entities" : 0, "genomes" : 0, "scratch" : 0}
+
+    if hasattr(field, "population_report"): # DistributedWorld, the plants live in the tiles
+        rep = field.population_report()
+        num = rep.pop("num_plants")
+
+    elif hasattr(field, "population"): # ArrayWorld
+        rep = population_report(field.population)
+        num = rep.pop("num_plants")
+
+    else:
+        num = len(field.entities)
+        rep["entities"] += sys.getsizeof(field.entities)
+        for plant in field.entities:
+            rep["entities"] += object_bytes(plant) + sys.getsizeof(plant.location)
+            rep["scratch"] += sum(sys.getsizeof(arr) for arr in (plant.inputs, plant.decision, plant.context))
+
+            gen = plant.genome
+            rep["genomes"] += object_bytes(gen) + sys.getsizeof(gen.normal_genes) + sys.getsizeof(gen.nutrition) + sys.getsizeof(gen.color)
+            rep["genomes"] += sum(sys.getsizeof(genes) for genes in gen.normal_genes)
+
+    rep["grids"] = grid_report(field)
+    rep["total"] = rep["entities"] + rep["genomes"] + rep["scratch"] + sum(rep["grids"].values())
+    rep["num_plants"] = num
+    return rep
+
+
+def project(config, world_class=None, pix_x=None, pix_y=None, starting_num=None):
+    """ estimate the memory footprint of a world before creating it
+
+    NB:
+    The per-plant bytes are measured on a small sample world with the same
+    config (backend and precision), the grid bytes are computed from their
+    shapes and types. "update" are the temporary full grids allocated during
+    one World.update. A growing ArrayWorld reallocates its arrays by doubling,
+    so during growth up to twice the plant memory can be needed.
+
+    Args:
+        config (dictionary): global parameters of the planned world
+        world_class (type, optional): World class to project, if None ArrayWorld. Defaults to None.
+        pix_x (int, optional): width, if None config["pix_x"]. Defaults to None.
+        pix_y (int, optional): height, if None config["pix_y"]. Defaults to None.
+        starting_num (int, optional): number of plants, if None config["starting_num"]. Defaults to None.
+
+    Returns:
+        dict: projected bytes, structured like report()
+    """
+    world_class = world.ArrayWorld if world_class is None else world_class
+    pix_x = config["pix_x"] if pix_x is None else pix_x
+    pix_y = config["pix_y"] if pix_y is None else pix_y
+    starting_num = config["starting_num"] if starting_num is None else starting_num
+
+    # measure the plants on a small sample
+    sample_num = 256
+    sample = world_class(dict(config, pix_x=32, pix_y=32, starting_num=sample_num, seed_mask=None))
+    measured = report(sample)
+
+    if hasattr(sample, "population"):
+        rows = max(starting_num, 1024) / len(sample.population.energy)
+    else:
+        rows = starting_num / sample_num
+
+    rep = {part: int(measured[part] * rows) for part in ("entities", "genomes", "scratch")}
+
+    # grids from their shapes and types
+    cells = pix_x * pix_y
+    dtype = precision.get_dtype(config).itemsize
+    rep["grids"] = {
+        "life" : cells * precision.get_life_dtype(config).itemsize,
+        "light" : cells * dtype,
+        "infos" : cells,
+        "energies" : cells * dtype,
+        "nutrients" : cells * config["num_nutrients"] * dtype,
+        "nutrients_age" : cells * 4,
+    }
+    rep["update"] = cells * (dtype + 1) # new_energies and new_infos
+    if hasattr(sample, "population"):
+        rep["update"] += cells * 8 # float64 energy scatter in reproduction.spread_energy
+
+    rep["total"] = rep["entities"] + rep["genomes"] + rep["scratch"] + sum(rep["grids"].values()) + rep["update"]
+    rep["num_plants"] = starting_num
+    return rep
+
+
+def format_report(rep):
+    """ human readable version of report() or project()
+
+    Args:
+        rep (dict): memory report
+
+    Returns:
+        string: one line per subsystem and grid, in MB
+    """
+    mb = 1024**2
+    lines = [f"memory of {rep['num_plants']} plants: {rep['total'] / mb:.1f} MB"]
+
+    for part in ("entities", "genomes", "scratch", "update"):
+        if part in rep:
+            per_plant = f", {rep[part] / max(rep['num_plants'], 1):.0f} B per plant" if part != "update" else ""
+            lines.append(f"  {part:<18} {rep[part] / mb:10.2f} MB{per_plant}")
+
+    for name, size in rep["grids"].items():
+        lines.append(f"  grid {name:<13} {size / mb:10.2f} MB")
+
+    return "\n".join(lines)
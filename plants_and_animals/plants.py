@@ -1,9 +1,9 @@
-import activations, genome
+import activations, genome, precision
 import numpy as np
 import time
 
 class PlantCell():
-    def __init__(self, config, location, parent_genome, energy, context=None):
+    def __init__(self, config, location, parent_genome, energy, context=None, rng=None, cache=None, genes=None):
         """ initialization of one plant cell
 
         Args:
@@ -12,23 +12,30 @@ class PlantCell():
             genome (Genome): _description_
             energy (float): _description_
             context (np.array, optional): currently meaningless. Defaults to None.
+            rng (np.random.Generator, optional): source of randomness for the genome. Defaults to None.
+            cache (DecisionCache, optional): memoizes the decisions of think(), if None no caching. Defaults to None.
+            genes (Genome, optional): use this genome as is instead of deriving one from parent_genome. Defaults to None.
         """
         self.config = config
         self.location = location
 
-        self.genome = genome.Genome(self.config, parent_genes=parent_genome)
+        self.genome = genes
+        if genes is None:
+            self.genome = genome.Genome(self.config, parent_genes=parent_genome, rng=rng)
+        self.cache = cache
 
         # currently not used
         self.context = context
         if context is None:
             self.context = np.zeros(config["context_size"])
         
-        # initialize state vars
-        self.energy = energy
+        # initialize state vars, scalars in the simulation precision
+        self.dtype = precision.get_dtype(config)
+        self.energy = self.dtype.type(energy)
         self.init_e = self.energy
         self.alive = True
-        self.decision = np.zeros(12)
-        self.inputs = np.zeros(10)
+        self.decision = np.zeros(12, dtype=self.dtype)
+        self.inputs = np.zeros(10, dtype=self.dtype)
         self.age = 0
         
         # set coordinates relative to cell
@@ -47,7 +54,7 @@ class PlantCell():
         return
     
     
-    def choices(self, new_energy, curr_life, curr_infos, curr_nurtients):
+    def choices(self, new_energy, curr_life, curr_infos, curr_nurtients, profiler=None):
         """ process a plants entire turn
 
         Args:
@@ -55,6 +62,7 @@ class PlantCell():
             curr_life (np.array): 2D array that indicates all life
             curr_infos (np.array): 2D array that indicates all neighbor infos
             curr_nurtients (np.array: 2D array that gives the nutrient state of the plant cells
+            profiler (Profiler, optional): accumulates the time of the sensing, think and accounting phases, see World.update. Defaults to None.
 
         Returns:
             tuple(np.array, np.array, float): (
@@ -74,7 +82,7 @@ class PlantCell():
         neighb = [curr_life[self.up, x], curr_life[y, self.right], curr_life[self.down, x], curr_life[y, self.left]]
         infos = [curr_infos[self.up, x], curr_infos[y, self.right], curr_infos[self.down, x], curr_infos[y, self.left]]
 
-        age_cost = self.config["sun_energy"] * 1.1 * (1 - np.exp(-self.config["energy_cost_age"] * self.age))
+        age_cost = self.dtype.type(self.config["sun_energy"] * 1.1 * (1 - np.exp(-self.config["energy_cost_age"] * self.age)))
 
         
         # compile input array
@@ -82,9 +90,13 @@ class PlantCell():
         self.inputs[1] = age_cost
         self.inputs[2:6] = neighb
         self.inputs[6:] = infos
+        if profiler is not None:
+            profiler.mark("sensing")
 
         # process network forward pass
         repr, send_e, set_inf = self.think()
+        if profiler is not None:
+            profiler.mark("think")
         
         # calculate cost of this turn
         cost = age_cost
@@ -100,6 +112,8 @@ class PlantCell():
         # if use more energy than in stores, or not enough nutrients available: die
         if self.energy < 0 or len(nutr_tile[nutr_tile < 0]) > 0:
             self.alive = False
+            if profiler is not None:
+                profiler.mark("accounting")
             return repr*0, send_e*0, set_inf*0
         
         # update nutrient tile
@@ -107,6 +121,8 @@ class PlantCell():
 
         # dissipation tax on unspent energy (very communist)
         self.energy -= self.energy * self.config["energy_cost_dissipation"] * self.config["sun_energy"]
+        if profiler is not None:
+            profiler.mark("accounting")
 
         return repr, send_e, set_inf
     
@@ -121,6 +137,12 @@ class PlantCell():
                 send_inf : Sets the information status of the cell
             )
         """
+        if self.cache is not None:
+            key, cached = self.cache.get(self.genome, self.inputs, self.energy, self.age)
+            if cached is not None:
+                self.decision, repr, send_e, set_inf = cached
+                return repr, send_e, set_inf
+
         out = activations.network(self.genome, self.inputs)
         self.decision = out.copy()
 
@@ -139,6 +161,8 @@ class PlantCell():
         set_inf = 0
         if raw_inf[0] >= 0.5: set_inf = 1 # round to indicate clear information
 
+        if self.cache is not None:
+            self.cache.put(self.genome, key, (self.decision, repr, send_e, set_inf))
         return repr, send_e, set_inf
     
     
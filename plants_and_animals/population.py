@@ -0,0 +1,359 @@
+import activations, genome, plants, precision, profiler
+import numpy as np
+
+
+class PlantPopulation():
+    def __init__(self, config, capacity=1024, rng=None):
+        """ structure-of-arrays storage of all plant cells in a world
+
+        NB:
+        Plant i is described by row i of every state array. The arrays are kept
+        dense: dead plants are compacted away at the end of each turn, so rows
+        [0, self.size) always hold exactly the living plants. The arrays grow
+        by doubling whenever more room is needed.
+
+        Args:
+            config (dictionary): global parameters for the evolution
+            capacity (int, optional): number of plants to preallocate room for. Defaults to 1024.
+            rng (np.random.Generator, optional): source of randomness for the genomes. Defaults to None.
+        """
+        self.config = config
+        self.size = 0
+
+        self.num_outputs = self.config["genome_size"][-1][1]
+        self.num_inputs = self.config["genome_size"][0][0]
+
+        # state vars, one row per plant
+        self.dtype = precision.get_dtype(self.config)
+        self.location = np.zeros((capacity, 2), dtype=np.int64)
+        self.energy = np.zeros(capacity, dtype=self.dtype)
+        self.init_e = np.zeros(capacity, dtype=self.dtype)
+        self.age = np.zeros(capacity, dtype=np.int64)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.inputs = np.zeros((capacity, self.num_inputs), dtype=self.dtype)
+        self.decision = np.zeros((capacity, self.num_outputs), dtype=self.dtype)
+        self.genome_slot = np.zeros(capacity, dtype=np.int64)
+
+        # genomes live in their own arena, plants only refer to their slot
+        self.genomes = genome.GenomeArena(self.config, capacity=capacity, rng=rng)
+
+        # the world hands in its profiler to split choices() into phases
+        self.profiler = profiler.Profiler([], [], history=1, enabled=False)
+
+        # insert and process config values
+        self.repr_cost = self.config["reproduction_cost"]
+        self.e_send_cost = 1 + self.config["energy_sending_cost"]
+        self.info_send_cost = self.config["info_sending_cost"]
+        self.nutr_greed = self.config["nutrient_greed"]
+
+        return
+
+
+    def _state_arrays(self):
+        return ["location", "energy", "init_e", "age", "alive", "inputs", "decision", "genome_slot"]
+
+
+    def _grow(self, needed):
+        """ reallocate all state arrays such that at least needed plants fit
+
+        Args:
+            needed (int): minimal capacity after growing
+        """
+        capacity = len(self.energy)
+        while capacity < needed:
+            capacity *= 2
+
+        for name in self._state_arrays():
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            setattr(self, name, new)
+        return
+
+
+    def add(self, locations, slots, energy):
+        """ append new plants to the population
+
+        Args:
+            locations (np.array): (k, 2) array of (y, x) locations
+            slots (np.array): genome arena slot of each new plant
+            energy (float): starting energy of each new plant
+        """
+        k = len(locations)
+        if self.size + k > len(self.energy):
+            self._grow(self.size + k)
+
+        sl = slice(self.size, self.size + k)
+        self.location[sl] = locations
+        self.energy[sl] = energy
+        self.init_e[sl] = energy
+        self.age[sl] = 0
+        self.alive[sl] = True
+        self.inputs[sl] = 0
+        self.decision[sl] = 0
+        self.genome_slot[sl] = slots
+
+        self.size += k
+        return
+
+
+    def remove(self, dead):
+        """ compact the population by removing all dead plants, keeping the order of the survivors
+
+        Args:
+            dead (np.array): boolean mask of length self.size, True for plants to remove
+        """
+        if not np.any(dead):
+            return # common for the tiles of domains.DistributedWorld
+
+        self.genomes.release(self.genome_slot[:self.size][dead])
+
+        keep = np.flatnonzero(~dead)
+        for name in self._state_arrays():
+            arr = getattr(self, name)
+            arr[:len(keep)] = arr[keep]
+
+        self.size = len(keep)
+        return
+
+
+    def seed(self, locations, energy):
+        """ add new plants with random genomes
+
+        Args:
+            locations (np.array): (k, 2) array of (y, x) locations
+            energy (float): starting energy of each new plant
+        """
+        self.add(locations, self.genomes.seed(len(locations)), energy)
+        return
+
+
+    def spawn(self, locations, parents, energy=1.0):
+        """ add the descendants of the given plants
+
+        Args:
+            locations (np.array): (k, 2) array of (y, x) locations of the descendants
+            parents (np.array): index of the parent of each descendant
+            energy (float, optional): starting energy of the descendants. Defaults to 1.0.
+        """
+        children = self.genomes.spawn(self.genome_slot[parents])
+        self.add(locations, children, energy)
+        return
+
+
+    def get_columns(self):
+        """ copies of the state of all plants, one array per column, e.g. for checkpoint.state
+
+        Returns:
+            dict: location, energy, init_e, age, genes_<i> per layer, nutrition and color
+        """
+        n = self.size
+        slots = self.genome_slot[:n]
+        columns = {
+            "location" : self.location[:n].copy(),
+            "energy" : self.energy[:n].copy(),
+            "init_e" : self.init_e[:n].copy(),
+            "age" : self.age[:n].copy(),
+        }
+        for i, genes in enumerate(self.genomes.get_normal_genes(slots)):
+            columns[f"genes_{i}"] = genes
+        columns["nutrition"] = self.genomes.nutrition[slots]
+        columns["color"] = self.genomes.color[slots]
+        return columns
+
+
+    def add_columns(self, columns):
+        """ append plants from columns written by get_columns(), without drawing random numbers
+
+        Args:
+            columns (dict): name -> array, see get_columns()
+        """
+        n = len(columns["location"])
+        arena = self.genomes
+        slots = arena.allocate(n)
+        for i, arena_genes in enumerate(arena.normal_genes):
+            arena_genes[slots] = columns[f"genes_{i}"]
+        arena.nutrition[slots] = columns["nutrition"]
+        arena.color[slots] = columns["color"]
+
+        start = self.size
+        self.add(columns["location"], slots, energy=0)
+        self.energy[start:self.size] = columns["energy"]
+        self.init_e[start:self.size] = columns["init_e"]
+        self.age[start:self.size] = columns["age"]
+        return
+
+
+    def neighbours(self):
+        """ coordinates of the four direct neighbours of every plant, clockwise starting up
+
+        Returns:
+            tuple(np.array, np.array): (size, 4) arrays of y and x coordinates
+        """
+        y = self.location[:self.size, 0]
+        x = self.location[:self.size, 1]
+        pix_y, pix_x = self.config["pix_y"], self.config["pix_x"]
+
+        ny = np.stack([(y - 1) % pix_y, y, (y + 1) % pix_y, y], axis=1)
+        nx = np.stack([x, (x + 1) % pix_x, x, (x - 1) % pix_x], axis=1)
+        return ny, nx
+
+
+    def choices(self, new_energy, curr_life, curr_infos, curr_nutrients):
+        """ process the entire turn of every plant at once, see PlantCell.choices
+
+        NB:
+        All plants sense the grids as they were at the start of the turn,
+        whereas in the object backend a plant sees the births and deaths of the
+        plants processed before it in the same turn. Per plant the computation
+        is otherwise identical to PlantCell.choices.
+
+        Args:
+            new_energy (np.array): energy gained from sun and neighbors, one value per plant
+            curr_life (np.array): 2D array that indicates all life
+            curr_infos (np.array): 2D array that indicates all neighbor infos
+            curr_nutrients (np.array): 3D array that gives the nutrient state of the plant cells, updated in place
+
+        Returns:
+            tuple(np.array, np.array, np.array): (
+                repr: (size, 4) indicator array where to reproduce,
+                send_e: (size, 4) float array how much energy to send,
+                send_inf: (size,) array indicating how to set information state
+                )
+        """
+        n = self.size
+        if n == 0: # extinct, nothing to decide
+            return np.zeros((0, 4), dtype=self.dtype), np.zeros((0, 4), dtype=self.dtype), np.zeros(0, dtype=self.dtype)
+
+        energy = self.energy[:n]
+        energy += new_energy
+        self.init_e[:n] = energy
+        self.age[:n] += 1
+
+        y = self.location[:n, 0]
+        x = self.location[:n, 1]
+        ny, nx = self.neighbours()
+
+        age_cost = self.config["sun_energy"] * 1.1 * (1 - np.exp(-self.config["energy_cost_age"] * self.age[:n]))
+        age_cost = age_cost.astype(self.dtype, copy=False)
+
+        # compile input array
+        inputs = self.inputs[:n]
+        inputs[:, 0] = energy
+        inputs[:, 1] = age_cost
+        inputs[:, 2:6] = curr_life[ny, nx]
+        inputs[:, 6:] = curr_infos[ny, nx]
+        self.profiler.mark("sensing")
+
+        # process network forward pass
+        repr, send_e, set_inf = self.think()
+        self.profiler.mark("think")
+
+        # calculate cost of this turn
+        cost = age_cost.copy()
+        cost += np.sum(repr, axis=1) * self.repr_cost
+        cost += np.sum(send_e, axis=1) * self.e_send_cost
+        cost += set_inf * self.info_send_cost
+        energy -= cost
+
+        # calculate the necessary nutrient pull
+        nutrition = self.genomes.nutrition[self.genome_slot[:n]]
+        nutr_pull = cost[:, None] * nutrition * self.nutr_greed
+        nutr_tile = curr_nutrients[y, x] - nutr_pull
+
+        # if use more energy than in stores, or not enough nutrients available: die
+        dead = (energy < 0) | np.any(nutr_tile < 0, axis=1)
+        alive = ~dead
+        self.alive[:n] = alive
+        repr[dead] = 0
+        send_e[dead] = 0
+        set_inf[dead] = 0
+
+        # update nutrient tiles (every plant sits on its own tile)
+        curr_nutrients[y[alive], x[alive]] = nutr_tile[alive]
+
+        # dissipation tax on unspent energy
+        energy[alive] -= energy[alive] * self.config["energy_cost_dissipation"] * self.config["sun_energy"]
+        self.profiler.mark("accounting")
+
+        return repr, send_e, set_inf
+
+
+    def think(self):
+        """ process the network pass of all plants and clean outputs, see PlantCell.think
+
+        Returns:
+            tuple(np.array, np.array, np.array): (
+                repr : (size, 4) array that indicates in clockwise dir where to add a descendant,
+                send_e : (size, 4) array that indicates in clockwise dir how much energy to send,
+                send_inf : (size,) array setting the information status of the cells
+            )
+        """
+        n = self.size
+        weights = self.genomes.get_normal_genes(self.genome_slot[:n])
+        out = activations.batch_network(weights, self.inputs[:n])
+        self.decision[:n] = out
+
+        return activations.batch_decisions(out)
+
+
+
+def validate_choices(config, num=200, seed=0):
+    """ run PlantPopulation.choices and PlantCell.choices on the same plants and grids and report how far they differ
+
+    NB:
+    The plants get random genomes, energies and ages from the seed, the grids
+    random infos and nutrients (low enough that some plants starve). Every
+    PlantCell is built from the genome in the arena slot of its twin, so both
+    backends decide with identical genes. A plant only writes the nutrients of
+    its own tile, so processing the cells one by one must give the same result
+    as the whole population at once, up to rounding of the network pass.
+
+    Args:
+        config (dictionary): global parameters of the world
+        num (int, optional): number of plants, at most one per tile. Defaults to 200.
+        seed (int, optional): seed of the plants and grids. Defaults to 0.
+
+    Returns:
+        dict: largest absolute difference of "repr", "send_e", "set_inf", "energy" and "nutrients", and number of plants with a different "alive"
+    """
+    rng = np.random.default_rng(seed)
+    pix_y, pix_x = config["pix_y"], config["pix_x"]
+    num = min(num, pix_y * pix_x)
+
+    flat = rng.choice(pix_y * pix_x, size=num, replace=False)
+    locations = np.stack([flat // pix_x, flat % pix_x], axis=1)
+    population = PlantPopulation(config, capacity=num, rng=rng)
+    population.seed(locations, 1.0)
+    population.energy[:num] = rng.uniform(0, 10, size=num)
+    population.age[:num] = rng.integers(0, 1000, size=num)
+
+    cells = []
+    arena = population.genomes
+    for i in range(num):
+        slot = population.genome_slot[i]
+        genes = genome.Genome.from_arrays(config, [g[slot] for g in arena.normal_genes], arena.nutrition[slot], arena.color[slot])
+        cell = plants.PlantCell(config, tuple(int(v) for v in locations[i]), None, population.energy[i], genes=genes)
+        cell.age = int(population.age[i])
+        cells.append(cell)
+
+    life = np.zeros((pix_y, pix_x), dtype=population.dtype)
+    life[locations[:, 0], locations[:, 1]] = 1
+    infos = rng.integers(0, 2, size=(pix_y, pix_x)).astype(population.dtype)
+    nutrients = rng.uniform(0, 20 * config["nutrient_greed"], size=(pix_y, pix_x, config["num_nutrients"])).astype(population.dtype)
+    new_energy = rng.uniform(0, 1, size=num).astype(population.dtype)
+
+    batch_nutrients = nutrients.copy()
+    repr, send_e, set_inf = population.choices(new_energy, life, infos, batch_nutrients)
+
+    cell_nutrients = nutrients.copy()
+    outputs = [cell.choices(new_energy[i], life, infos, cell_nutrients) for i, cell in enumerate(cells)]
+
+    return {
+        "repr" : float(np.max(np.abs(repr - np.array([o[0] for o in outputs])), initial=0)),
+        "send_e" : float(np.max(np.abs(send_e - np.array([o[1] for o in outputs])), initial=0)),
+        "set_inf" : float(np.max(np.abs(set_inf - np.array([o[2] for o in outputs])), initial=0)),
+        "energy" : float(np.max(np.abs(population.energy[:num] - np.array([cell.energy for cell in cells])), initial=0)),
+        "nutrients" : float(np.max(np.abs(batch_nutrients - cell_nutrients))),
+        "alive" : int(np.sum(population.alive[:num] != np.array([cell.alive for cell in cells]))),
+    }
@@ -0,0 +1,101 @@
+import numpy as np
+
+
+def get_dtype(config):
+    """ float type of genomes, network inference, energies and nutrients
+
+    Args:
+        config (dictionary): global parameters, config["precision"] is "float64" (default) or "float32"
+
+    Returns:
+        np.dtype: float type to use
+    """
+    precision = config.get("precision", "float64")
+    if precision not in ("float64", "float32"):
+        raise ValueError("unexpected precision " + str(precision))
+
+    return np.dtype(precision)
+
+
+def get_life_dtype(config):
+    """ type of the life grid, it only holds 0/1 so in float32 mode it is stored as uint8
+
+    Args:
+        config (dictionary): global parameters
+
+    Returns:
+        np.dtype: type of World.life
+    """
+    if get_dtype(config) == np.float32:
+        return np.dtype(np.uint8)
+
+    return np.dtype(np.float64)
+
+
+def population_stats(field):
+    """ summary statistics of the plants in a world
+
+    Args:
+        field (World): world to summarize
+
+    Returns:
+        dict: population, mean energy and mean age of the plants and mean nutrients per tile
+    """
+    if hasattr(field, "get_state"): # DistributedWorld, the plants live in the tiles
+        columns, _ = field.get_state()
+        energy = columns["energy"]
+        age = columns["age"]
+    elif hasattr(field, "population"): # ArrayWorld
+        pop = field.population
+        energy = pop.energy[:pop.size]
+        age = pop.age[:pop.size]
+    else:
+        energy = np.array([plant.energy for plant in field.entities])
+        age = np.array([plant.age for plant in field.entities])
+
+    field.flush_nutrients()
+    return {
+        "population" : len(energy),
+        "energy" : float(np.mean(energy)) if len(energy) > 0 else 0.0,
+        "age" : float(np.mean(age)) if len(age) > 0 else 0.0,
+        "nutrients" : float(np.mean(field.nutrients)),
+    }
+
+
+def validate(config, world_class, steps=100):
+    """ run the same world in float64 and float32 and report how far the population statistics drift apart
+
+    NB:
+    Both runs use the same seed, so they start from identical plants (up to
+    rounding of the genomes) and draw the same random numbers as long as their
+    populations agree. Once a single decision flips the runs diverge like two
+    different seeds would, so the drift measures that divergence rather than
+    pure rounding error.
+
+    Args:
+        config (dictionary): global parameters of the world, config["precision"] is ignored
+        world_class (type): World class to run, e.g. world.ArrayWorld
+        steps (int, optional): number of steps to run. Defaults to 100.
+
+    Returns:
+        dict: per statistic a (steps, 3) array with the float64 value, the float32 value and their relative difference
+    """
+    seed = config.get("seed")
+    if seed is None:
+        seed = int(np.random.default_rng().integers(2**32))
+
+    worlds = [world_class(dict(config, precision=p, seed=seed)) for p in ("float64", "float32")]
+
+    report = {}
+    for step in range(steps):
+        stats = []
+        for field in worlds:
+            field.update()
+            stats.append(population_stats(field))
+
+        for key in stats[0]:
+            a, b = stats[0][key], stats[1][key]
+            drift = abs(a - b) / max(abs(a), 1e-12)
+            report.setdefault(key, np.zeros((steps, 3)))[step] = (a, b, drift)
+
+    return report
@@ -0,0 +1,142 @@
+import numpy as np
+import time
+
+
+class Profiler():
+    def __init__(self, phases, counters, history=1000, enabled=True):
+        """ per-phase timings and counters of the last steps of a simulation
+
+        NB:
+        Timings and counters are kept in ring buffers of the last `history`
+        steps, so memory stays bounded on long runs. When disabled every method
+        returns immediately, so the instrumentation can stay in the hot loop.
+
+        Args:
+            phases (list(string)): names of the timed phases of one step
+            counters (list(string)): names of the per-step counters
+            history (int, optional): number of steps kept. Defaults to 1000.
+            enabled (bool, optional): whether to record anything. Defaults to True.
+        """
+        self.enabled = enabled
+        self.phases = list(phases)
+        self.counters = list(counters)
+        self.size = history
+
+        self.phase_idx = {name: idx for idx, name in enumerate(self.phases)}
+        self.counter_idx = {name: idx for idx, name in enumerate(self.counters)}
+
+        self.timings = np.zeros((history, len(self.phases)))
+        self.counts = np.zeros((history, len(self.counters)), dtype=np.int64)
+
+        self.steps = 0 # number of recorded steps
+        self.row = 0 # ring buffer row of the current step
+        self.last = 0.0 # time of the last start() or mark()
+        return
+
+
+    def start(self):
+        """ begin recording a step
+        """
+        if not self.enabled:
+            return
+
+        self.row = self.steps % self.size
+        self.timings[self.row] = 0
+        self.counts[self.row] = 0
+        self.last = time.perf_counter()
+        return
+
+
+    def mark(self, phase):
+        """ attribute the time since the last start() or mark() to a phase
+
+        Args:
+            phase (string): name of the phase that just ended
+        """
+        if not self.enabled:
+            return
+
+        t = time.perf_counter()
+        self.timings[self.row, self.phase_idx[phase]] += t - self.last
+        self.last = t
+        return
+
+
+    def count(self, name, value):
+        """ set a counter of the current step
+
+        Args:
+            name (string): name of the counter
+            value (int): value of the counter at this step
+        """
+        if not self.enabled:
+            return
+
+        self.counts[self.row, self.counter_idx[name]] = value
+        return
+
+
+    def stop(self):
+        """ finish recording a step
+        """
+        if not self.enabled:
+            return
+
+        self.steps += 1
+        return
+
+
+    def history(self, name):
+        """ recorded values of a phase or counter, oldest first
+
+        Args:
+            name (string): name of a phase or counter
+
+        Returns:
+            np.array: one value per recorded step, at most `history` values
+        """
+        n = min(self.steps, self.size)
+        rows = np.arange(self.steps - n, self.steps) % self.size
+
+        if name in self.phase_idx:
+            return self.timings[rows, self.phase_idx[name]]
+        return self.counts[rows, self.counter_idx[name]]
+
+
+    def summary(self):
+        """ statistics over the recorded steps
+
+        Returns:
+            dict: per phase the mean, max and last time in seconds, per counter the mean and last value
+        """
+        stats = {}
+        for name in self.phases + self.counters:
+            values = self.history(name)
+            if len(values) == 0:
+                continue
+
+            stats[name] = {"mean" : float(np.mean(values)), "last" : values[-1].item()}
+            if name in self.phase_idx:
+                stats[name]["max"] = float(np.max(values))
+
+        return stats
+
+
+    def report(self):
+        """ human readable summary, e.g. to print every few hundred steps
+
+        Returns:
+            string: one line per phase and one for the counters
+        """
+        stats = self.summary()
+        lines = [f"last {min(self.steps, self.size)} steps:"]
+
+        total = sum(stats[name]["mean"] for name in self.phases if name in stats)
+        for name in self.phases:
+            if name in stats:
+                mean = stats[name]["mean"]
+                share = mean / total if total > 0 else 0.0
+                lines.append(f"  {name:<13} mean {mean*1e3:8.3f} ms, max {stats[name]['max']*1e3:8.3f} ms, {100*share:5.1f}%")
+
+        lines.append("  " + ", ".join(f"{name} {stats[name]['last']}" for name in self.counters if name in stats))
+        return "\n".join(lines)
@@ -0,0 +1,110 @@
+import numpy as np
+
+
+def spread_energy(send_e, ny, nx, new_energies):
+    """ add the energy every plant sends to its neighbours, as one scatter-add
+
+    Args:
+        send_e (np.array): (N, 4) array how much energy each plant sends, clockwise starting up
+        ny (np.array): (N, 4) y coordinates of the neighbours of each plant
+        nx (np.array): (N, 4) x coordinates of the neighbours of each plant
+        new_energies (np.array): 2D array to which the sent energies are added in place
+    """
+    flat_neighbours = np.ravel_multi_index((ny, nx), new_energies.shape)
+    new_energies += np.bincount(flat_neighbours.ravel(), weights=send_e.ravel(), minlength=new_energies.size).reshape(new_energies.shape)
+    return
+
+
+def resolve(repr, send_e, ny, nx, locations, dead, priority, curr_life, new_energies=None):
+    """ decide all births of one turn at once and spread the sent energy
+
+    NB:
+    World.update visits the plants one after another, so a plant can only
+    reproduce into a cell that is empty at its turn: cells that were empty at
+    the start of the turn, or whose occupant died at an earlier turn, and that
+    no earlier plant has claimed yet. Here the update order is given by a random
+    priority per plant (lower goes first) and the same rule is applied to all
+    claims together:
+    a claim is valid if its target cell was empty, or its occupant died with a
+    lower priority than the claimant, and of all valid claims on a cell the one
+    with the lowest priority wins (ties of one plant resolved clockwise).
+    With a uniformly random priority this reproduces the random-order semantics.
+
+    Args:
+        repr (np.array): (N, 4) indicator array where each plant wants to reproduce, clockwise starting up
+        send_e (np.array): (N, 4) array how much energy each plant sends, clockwise starting up
+        ny (np.array): (N, 4) y coordinates of the neighbours of each plant
+        nx (np.array): (N, 4) x coordinates of the neighbours of each plant
+        locations (np.array): (N, 2) array of (y, x) plant locations
+        dead (np.array): (N,) boolean array, True for plants dying this turn
+        priority (np.array): (N,) array of distinct update priorities, lower goes first
+        curr_life (np.array): 2D array that indicates all life at the start of the turn
+        new_energies (np.array, optional): 2D array to which the sent energies are added in place,
+            if None send_e is ignored (see spread_energy). Defaults to None.
+
+    Returns:
+        tuple(np.array, np.array): (
+            births: (k, 2) array of (y, x) locations of the new plants, in update order,
+            parents: (k,) array of the index of the parent of each new plant
+            )
+    """
+    shape = curr_life.shape
+
+    # spread energy, a scatter-add over all neighbour cells
+    if new_energies is not None:
+        spread_energy(send_e, ny, nx, new_energies)
+    flat_neighbours = np.ravel_multi_index((ny, nx), shape)
+
+    # all claims, a claim is a (parent, direction) pair
+    parents, direction = np.nonzero(repr == 1)
+    targets = flat_neighbours[parents, direction]
+    claim_priority = priority[parents]
+
+    occupied = curr_life.ravel()[targets] != 0
+    dead_cells = np.ravel_multi_index((locations[dead, 0], locations[dead, 1]), shape)
+    winners = settle(targets, claim_priority, direction, occupied, dead_cells, priority[dead])
+
+    births = np.stack(np.unravel_index(targets[winners], shape), axis=1)
+    return births, parents[winners]
+
+
+def settle(targets, claim_priority, direction, occupied, dead_cells, dead_priority):
+    """ pick the winning claim of every cell by the rule of resolve()
+
+    NB:
+    The rule only needs the claims on a cell and the fate of its occupant, so
+    it can also be applied to claims collected from several populations (see
+    domains.py).
+
+    Args:
+        targets (np.array): (k,) flat index of the target cell of each claim
+        claim_priority (np.array): (k,) priority of the claimant of each claim
+        direction (np.array): (k,) direction of each claim, clockwise starting up
+        occupied (np.array): (k,) boolean array, True if the target cell was alive at the start of the turn
+        dead_cells (np.array): flat indices of the cells whose occupant dies this turn
+        dead_priority (np.array): priority of each of those occupants
+
+    Returns:
+        np.array: indices of the winning claims, in priority order
+    """
+    # the priority from which on each target cell is free: -1 if empty, the
+    # priority of its occupant if that dies this turn, never otherwise
+    free_from = np.full(len(targets), -1, dtype=np.int64)
+    free_from[occupied] = np.iinfo(np.int64).max
+
+    order = np.argsort(dead_cells)
+    dead_cells = dead_cells[order]
+    dead_priority = dead_priority[order]
+
+    pos = np.searchsorted(dead_cells, targets[occupied])
+    pos = np.minimum(pos, max(len(dead_cells) - 1, 0))
+    found = dead_cells[pos] == targets[occupied] if len(dead_cells) > 0 else np.zeros(len(pos), dtype=bool)
+    idx = np.flatnonzero(occupied)[found]
+    free_from[idx] = dead_priority[pos[found]]
+
+    valid = np.flatnonzero(claim_priority > free_from)
+
+    # the first valid claim on each cell wins
+    order = np.lexsort((direction[valid], claim_priority[valid]))
+    _, first = np.unique(targets[valid][order], return_index=True)
+    return valid[order[np.sort(first)]]
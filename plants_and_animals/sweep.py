@@ -0,0 +1,305 @@
+import numpy as np
+import itertools
+import json
+import multiprocessing
+import os
+import time
+import defaults, domains, world
+
+
+def grid(space):
+    """ all combinations of config overrides
+
+    Args:
+        space (dict): config key -> list of values, e.g. {"sun_energy" : [0.3, 0.5], "reproduction_cost" : [1.0, 2.0]}
+
+    Returns:
+        list(dict): one dict of overrides per combination
+    """
+    keys = list(space.keys())
+    return [dict(zip(keys, values)) for values in itertools.product(*(space[key] for key in keys))]
+
+
+def sample(space, num, seed=None):
+    """ random config overrides
+
+    Args:
+        space (dict): config key -> list of values to choose from, or (low, high) tuple to draw uniformly from
+            (integers if both bounds are ints), e.g. {"sun_energy" : (0.2, 1.0), "genome_mutation" : [[1e-2, 1e-2, 1e-2], [1e-3, 1e-2, 1e-2]]}
+        num (int): number of samples
+        seed (int, optional): seed of the sampling. Defaults to None.
+
+    Returns:
+        list(dict): one dict of overrides per sample
+    """
+    rng = np.random.default_rng(seed)
+    runs = []
+    for _ in range(num):
+        overrides = {}
+        for key, values in space.items():
+            if isinstance(values, tuple):
+                low, high = values
+                if isinstance(low, int) and isinstance(high, int):
+                    overrides[key] = int(rng.integers(low, high + 1))
+                else:
+                    overrides[key] = float(rng.uniform(low, high))
+            else:
+                overrides[key] = values[int(rng.integers(len(values)))]
+        runs.append(overrides)
+    return runs
+
+
+BACKENDS = {"objects" : world.World, "arrays" : world.ArrayWorld, "domains" : domains.DistributedWorld}
+
+
+def run(config, steps):
+    """ run one world headless for a number of steps or until extinction
+
+    NB:
+    The runs of a Sweep already are pool processes, which can't start the
+    worker processes of the "domains" backend, so there it needs
+    config["processes"] = False.
+
+    Args:
+        config (dictionary): global parameters of the world, config["backend"] selects World, ArrayWorld or DistributedWorld
+        steps (int): maximum number of steps
+
+    Returns:
+        dict: population (curve, one value per step), survival (steps until extinction, or steps),
+            extinct, final, peak and mean population, setup_seconds (creating the world), seconds and steps_per_sec (stepping it)
+
+    Raises:
+        ValueError: raised for an unknown backend, or "domains" with worker processes inside a pool process
+    """
+    backend = config.get("backend", "objects")
+    if backend not in BACKENDS:
+        raise ValueError("unexpected backend " + str(backend))
+    if backend == "domains" and config.get("processes", True) and multiprocessing.current_process().daemon:
+        raise ValueError("the domains backend needs processes=False in a pool process")
+
+    t = time.time()
+    field = BACKENDS[backend](config)
+    setup_seconds = time.time() - t
+
+    t = time.time()
+    curve = []
+    try:
+        for _ in range(steps):
+            field.update()
+            curve.append(int(np.count_nonzero(field.life)))
+            if curve[-1] == 0:
+                break
+    finally:
+        if backend == "domains":
+            field.close()
+    seconds = time.time() - t
+
+    return {
+        "population" : curve,
+        "survival" : len(curve),
+        "extinct" : len(curve) > 0 and curve[-1] == 0,
+        "final_population" : curve[-1] if len(curve) > 0 else 0,
+        "peak_population" : max(curve, default=0),
+        "mean_population" : float(np.mean(curve)) if len(curve) > 0 else 0.0,
+        "setup_seconds" : setup_seconds,
+        "seconds" : seconds,
+        "steps_per_sec" : len(curve) / max(seconds, 1e-12),
+    }
+
+
+def _run_job(job):
+    """ worker of Sweep, runs one job and never raises
+    """
+    idx, config, steps = job
+    try:
+        result = run(config, steps)
+    except Exception as e:
+        result = {"error" : repr(e)}
+    return idx, result
+
+
+def _json(value):
+    """ JSON version of a value, tuples and arrays (e.g. a seed mask) become lists """
+    return json.loads(json.dumps(value, default=lambda v: np.asarray(v).tolist()))
+
+
+def _csv_cell(value):
+    """ CSV cell of a value, lists and strings are quoted JSON """
+    if value is None:
+        return ""
+    if isinstance(value, (list, str)):
+        return '"' + json.dumps(value).replace('"', '""') + '"'
+    return str(value)
+
+
+class Sweep():
+    def __init__(self, config, runs, directory, steps, workers=None):
+        """ headless parameter sweep over a process pool
+
+        NB:
+        The sweep is kept in a directory: sweep.json holds the base config,
+        the runs and the steps, results.jsonl one line per finished run,
+        appended as soon as it finishes. Running the same sweep again in the
+        same directory only runs the missing runs, so an interrupted sweep
+        resumes where it stopped. Unless
+        a run overrides "seed", run i uses the seed config["seed"] + i (0 + i if
+        not set), so every run is reproducible.
+
+        Args:
+            config (dictionary): base global parameters
+            runs (list(dict)): config overrides per run, see grid() and sample()
+            directory (string): directory of the sweep
+            steps (int): maximum number of steps per run
+            workers (int, optional): number of processes, if None one per core. Defaults to None.
+
+        Raises:
+            ValueError: raised if the directory holds a different sweep
+        """
+        self.config = config
+        self.runs = runs
+        self.directory = directory
+        self.steps = steps
+        self.workers = workers
+
+        os.makedirs(self.directory, exist_ok=True)
+        definition = {"config" : _json(config), "runs" : _json(runs), "steps" : steps}
+        path = os.path.join(self.directory, "sweep.json")
+        if os.path.exists(path):
+            with open(path) as f:
+                if json.load(f) != definition:
+                    raise ValueError("directory " + self.directory + " holds a different sweep")
+        else:
+            with open(path, "w") as f:
+                json.dump(definition, f)
+        return
+
+
+    def results(self):
+        """ results of all finished runs
+
+        Returns:
+            dict: run index -> dict with the overrides and the metrics of run()
+        """
+        done = {}
+        path = os.path.join(self.directory, "results.jsonl")
+        if not os.path.exists(path):
+            return done
+
+        with open(path) as f:
+            for line in f:
+                try:
+                    result = json.loads(line)
+                except json.JSONDecodeError: # line cut off by an interruption
+                    continue
+                done[result["run"]] = result
+        return done
+
+
+    def jobs(self):
+        """ configs of all runs that are not finished yet
+
+        Returns:
+            list(tuple): (run index, config, steps) per missing run
+        """
+        base_seed = self.config.get("seed")
+        base_seed = 0 if base_seed is None else base_seed
+        done = self.results()
+
+        jobs = []
+        for idx, overrides in enumerate(self.runs):
+            if idx in done:
+                continue
+            config = dict(self.config, seed=base_seed + idx, profile=False)
+            config.update(overrides)
+            jobs.append((idx, config, self.steps))
+        return jobs
+
+
+    def start(self, verbose=True):
+        """ run all missing runs and append their results
+
+        Args:
+            verbose (bool, optional): print a line per finished run. Defaults to True.
+
+        Returns:
+            dict: run index -> result of all runs, see results()
+        """
+        jobs = self.jobs()
+        if len(jobs) > 0:
+            path = os.path.join(self.directory, "results.jsonl")
+            with open(path, "a") as f, multiprocessing.Pool(self.workers) as pool:
+                if f.tell() > 0: # start a fresh line after a line cut off by an interruption
+                    with open(path, "rb") as g:
+                        g.seek(-1, os.SEEK_END)
+                        if g.read() != b"\n":
+                            f.write("\n")
+
+                for idx, result in pool.imap_unordered(_run_job, jobs):
+                    result = dict(result, run=idx, overrides=_json(self.runs[idx]))
+                    f.write(json.dumps(result) + "\n")
+                    f.flush()
+
+                    if verbose:
+                        summary = result.get("error", f"survival {result.get('survival')}, final {result.get('final_population')}, {result.get('steps_per_sec', 0):.1f} steps/s")
+                        print(f"run {idx} {self.runs[idx]}: {summary}")
+
+        return self.results()
+
+
+    def table(self, path=None):
+        """ one row per finished run, the overrides and the scalar metrics
+
+        Args:
+            path (string, optional): where to write the table as CSV, if None results.csv in the directory. Defaults to None.
+
+        Returns:
+            list(dict): rows ordered by run index
+        """
+        path = os.path.join(self.directory, "results.csv") if path is None else path
+        done = self.results()
+        keys = list(dict.fromkeys(key for overrides in self.runs for key in overrides))
+        metrics = ["survival", "extinct", "final_population", "peak_population", "mean_population", "setup_seconds", "steps_per_sec", "error"]
+
+        rows = []
+        for idx in sorted(done):
+            row = {"run" : idx}
+            row.update({key: done[idx]["overrides"].get(key) for key in keys})
+            row.update({key: done[idx].get(key) for key in metrics})
+            rows.append(row)
+
+        with open(path, "w") as f:
+            columns = ["run"] + keys + metrics
+            f.write(",".join(columns) + "\n")
+            for row in rows:
+                f.write(",".join(_csv_cell(row[col]) for col in columns) + "\n")
+
+        return rows
+
+
+
+if __name__ == "__main__":
+    # SET SOME PARAMS HERE
+    DIRECTORY = "sweep_results"
+    STEPS = 1000
+    WORKERS = None # processes, None for one per core
+
+    # the defaults of main.py (see defaults.py), smaller and vectorized
+    config = defaults.get_config(
+        pix_x=100,
+        pix_y=100,
+        starting_num=2500,
+        backend="arrays",
+        seed=0,
+    )
+
+    # SET THE SWEPT PARAMS HERE, grid() for all combinations or sample() for random ones
+    runs = grid({
+        "sun_energy" : [0.3, 0.5, 0.8],
+        "reproduction_cost" : [1.0, 2.0, 4.0],
+        "energy_cost_age" : [1e-3, 1e-2],
+    })
+
+    sweep = Sweep(config, runs, DIRECTORY, STEPS, workers=WORKERS)
+    sweep.start()
+    sweep.table()
+    print("results in", os.path.join(DIRECTORY, "results.csv"))
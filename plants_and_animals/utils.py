@@ -0,0 +1,24 @@
+import numpy as np
+from PIL import Image
+
+def get_seed_mask(path, pix_x, pix_y):
+    """ Creates a density mask for the starting plants from an image
+
+    NB:
+    The image is scaled to the world size, darker pixels are more likely to
+    start with a plant, fully WHITE pixels never do.
+
+    Args:
+        path (string): path to the image
+        pix_x (int): width of world
+        pix_y (int): height of world
+
+    Returns:
+        np.array: (pix_y, pix_x) density array that can be used as config["seed_mask"]
+    """
+
+    img = Image.open(path).convert("L").resize((pix_x, pix_y))
+
+    arr = np.asarray(img, dtype=np.float64)
+
+    return 1 - arr / 255
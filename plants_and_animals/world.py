@@ -1,11 +1,15 @@
 import numpy as np
-import plants, genome
+import plants, genome, population, reproduction, precision, decision_cache, profiler
 import time
 
 def now():
     return time.process_time()
 
 class World():
+    # timed phases of update(), see profiler.py
+    phases = ["restore", "permutation", "sensing", "think", "accounting", "reproduction", "energy", "removal"]
+    counters = ["births", "deaths", "population"]
+
     def __init__(self, config):
         """ initialize world
 
@@ -16,41 +20,199 @@ class World():
         self.config = config
         self.world_age = 0
 
+        # all randomness of the world is drawn from here, reproducible via config["seed"]
+        self.rng = np.random.default_rng(self.config.get("seed"))
+
         self.dirs = [(-1, 0), (0, 1), (1, 0), (0, -1)]
         self.pix_x = self.config["pix_x"]
         self.pix_y = self.config["pix_y"]
 
         self.entities = []
 
+        # per-phase timings of update(), cheap enough to stay on, see config["profile"]
+        self.profiler = profiler.Profiler(self.phases, self.counters, history=self.config.get("profile_history", 1000), enabled=self.config.get("profile", False))
+
+        # optional memoization of PlantCell.think, config["think_cache"] holds the DecisionCache parameters
+        self.think_cache = None
+        if self.config.get("think_cache") is not None:
+            self.think_cache = decision_cache.DecisionCache(**self.config["think_cache"])
+
+        # float type of energies and nutrients, see precision.py
+        self.dtype = precision.get_dtype(self.config)
+
         # global 2D arrays initialization
-        self.life = np.zeros((self.config["pix_y"], self.config["pix_x"])) # pixel life location indicator
-        self.light = np.ones_like(self.life) * self.config["sun_energy"] # how much light hits each location
+        self.life = np.zeros((self.config["pix_y"], self.config["pix_x"]), dtype=precision.get_life_dtype(self.config)) # pixel life location indicator
+        self.light = np.ones((self.pix_y, self.pix_x), dtype=self.dtype) * self.dtype.type(self.config["sun_energy"]) # how much light hits each location
         self.infos = np.zeros((self.pix_y, self.pix_x), dtype=np.int8) # info at each location
-        self.energies = np.zeros_like(self.life) # sent energies at each location
-        self.nutrients = np.ones((self.pix_x, self.pix_y, self.config["num_nutrients"])) # nutrients at each location
+        self.energies = np.zeros_like(self.light) # sent energies at each location
+        self.nutrients = np.ones((self.pix_x, self.pix_y, self.config["num_nutrients"]), dtype=self.dtype) # nutrients at each location
+
+        # with lazy restoration, nutrients of a tile are only up to date at the world age stored here
+        self.lazy_nutrients = self.config.get("lazy_nutrients", False)
+        self.nutrients_age = np.zeros(self.nutrients.shape[:2], dtype=np.int32)
+
+        # births and deaths since the last take_changes(), only recorded once it was called
+        self.changes = None
+        self.num_changes = 0
 
 
         # initialize life on field randomly
-        locations_pool = [(x, y) for y in range(self.pix_y) for x in range(self.pix_x)]
-        np.random.shuffle(locations_pool)
-        locations = locations_pool[:self.config["starting_num"]]
-        
-        for loc in locations:
-            self.entities.append(plants.PlantCell(self.config, loc, None, energy=1))
-            self.life[loc] = 1
+        locations = self.sample_locations(self.config["starting_num"], self.config.get("seed_mask"))
+        self._seed(locations)
+        self.life[locations[:, 0], locations[:, 1]] = 1
+
+        return
+
+    def sample_locations(self, num, mask=None):
+        """ sample distinct random locations on the field
+
+        NB:
+        With a mask, each location is drawn with probability proportional to its
+        mask value (weighted sampling without replacement via exponential keys).
+        Locations with mask value 0 are never drawn, so fewer than num locations
+        are returned if the mask has fewer nonzero entries.
+
+        Args:
+            num (int): number of locations
+            mask (np.array, optional): (pix_y, pix_x) array of non-negative densities. Defaults to None.
+
+        Returns:
+            np.array: (num, 2) array of (y, x) locations
+        """
+        size = self.pix_y * self.pix_x
+
+        if mask is None:
+            flat = self.rng.choice(size, size=min(num, size), replace=False)
+        else:
+            weights = np.asarray(mask, dtype=np.float64).ravel()
+            candidates = np.flatnonzero(weights > 0)
+            num = min(num, len(candidates))
+            keys = self.rng.exponential(size=len(candidates)) / weights[candidates]
+            flat = candidates[np.argpartition(keys, num - 1)[:num]] if num > 0 else candidates[:0]
+
+        return np.stack(np.unravel_index(flat, (self.pix_y, self.pix_x)), axis=1)
+
+    def _seed(self, locations):
+        """ create the starting plants
+
+        Args:
+            locations (np.array): (N, 2) array of (y, x) locations of the starting plants
+        """
+        # draw the genomes of all plants in one batch, each plant gets a copy of its row
+        arena = genome.GenomeArena(self.config, capacity=max(len(locations), 1), rng=self.rng)
+        slots = arena.seed(len(locations))
+
+        for loc, slot in zip(map(tuple, locations.tolist()), slots.tolist()):
+            gen = genome.Genome.from_arrays(self.config, [genes[slot] for genes in arena.normal_genes], arena.nutrition[slot], arena.color[slot], rng=self.rng)
+            self.entities.append(plants.PlantCell(self.config, loc, None, energy=1, rng=self.rng, cache=self.think_cache, genes=gen))
+        return
+
+    def restore_nutrients(self, y, x):
+        """ bring the nutrients of the given tiles up to date with the world age (lazy restoration)
+
+        Args:
+            y (int or np.array): y coordinates of the tiles, must not contain duplicates
+            x (int or np.array): x coordinates of the tiles
+        """
+        steps = self.world_age - self.nutrients_age[y, x]
+        self.nutrients[y, x] += (steps * self.config["nutrient_restore"])[..., None]
+        self.nutrients_age[y, x] = self.world_age
+        return
+
+    def flush_nutrients(self):
+        """ bring the nutrients of all tiles up to date, e.g. before rendering or saving them
+        """
+        steps = self.world_age - self.nutrients_age
+        self.nutrients += (steps * self.config["nutrient_restore"])[..., None]
+        self.nutrients_age[:] = self.world_age
+        return
+
+    def get_plants(self):
+        """ returns locations and colors of all living plants, e.g. for rendering
+
+        Returns:
+            tuple(np.array, np.array): (N, 2) array of (y, x) locations and (N, 3) array of RGB colors
+        """
+        locations = np.array([plant.location for plant in self.entities], dtype=np.int64).reshape(-1, 2)
+        colors = np.array([plant.genome.color for plant in self.entities], dtype=np.uint8).reshape(-1, 3)
+        return locations, colors
+
+    def _log_changes(self, locations, colors=None):
+        """ remember cells whose plant was born or died, see take_changes()
+
+        Args:
+            locations (np.array): (k, 2) array of (y, x) locations
+            colors (np.array, optional): (k, 3) array of the RGB colors of the new plants, if None the cells are empty now. Defaults to None.
+        """
+        if self.changes is None:
+            return
 
+        if colors is None:
+            colors = np.zeros((len(locations), 3), dtype=np.uint8)
+        self.changes.append((locations, colors))
+        self.num_changes += len(locations)
+        if self.num_changes > self.pix_x * self.pix_y:
+            self.changes = None # more than redrawing everything, see take_changes()
         return
-    
+
+    def take_changes(self):
+        """ cells whose plant was born or died since the last call, e.g. for viewport.Pyramid.set_cells
+
+        NB:
+        Changes are only recorded after the first call, so a world nobody draws
+        pays nothing for them. None means that everything may have changed (the
+        first call, or more changes than cells since the last one), the whole
+        world should then be drawn from get_plants().
+
+        Returns:
+            tuple(np.array, np.array): (N, 2) array of (y, x) locations and (N, 3) array of their current RGB colors, black if empty, or None
+        """
+        changes = self.changes
+        self.changes = []
+        self.num_changes = 0
+        if changes is None:
+            return None
+
+        locations = np.concatenate([loc for loc, _ in changes] + [np.zeros((0, 2), dtype=np.int64)])
+        colors = np.concatenate([col for _, col in changes] + [np.zeros((0, 3), dtype=np.uint8)])
+
+        # the last change of a cell is its current color
+        flat = locations[:, 0] * self.pix_x + locations[:, 1]
+        _, last = np.unique(flat[::-1], return_index=True)
+        keep = len(flat) - 1 - last
+        return locations[keep], colors[keep]
+
+    def get_frame(self):
+        """ the visible state of the world, e.g. for a recorder.Recorder
+
+        Returns:
+            dict: life, infos and a (pix_y, pix_x, 3) uint8 image of the plant colors
+        """
+        locations, colors = self.get_plants()
+        image = np.zeros(self.life.shape + (3,), dtype=np.uint8)
+        image[locations[:, 0], locations[:, 1]] = colors
+        return {"life" : self.life, "infos" : self.infos, "color" : image}
+
     def update(self):
         """ update all life in the world at one time step
+
+        NB:
+        With config["lazy_nutrients"], nutrients are only restored on the tiles
+        plants actually use, so self.nutrients is stale elsewhere until
+        flush_nutrients() is called.
         """
 
         # preprocess plant pass
+        self.profiler.start()
         self.world_age += 1
 
-        self.nutrients += self.config["nutrient_restore"] # restore nutrients
+        if not self.lazy_nutrients:
+            self.flush_nutrients() # restore nutrients
+        self.profiler.mark("restore")
 
-        arr = np.random.permutation(len(self.entities)) # set random update order
+        arr = self.rng.permutation(len(self.entities)) # set random update order
+        deaths = self.rng.uniform(size=len(self.entities)) < self.config["death_chance"] # random deaths
+        self.profiler.mark("permutation")
         new_entities = []
         dead_entities = []
         new_energies = np.zeros_like(self.light)
@@ -61,11 +223,15 @@ class World():
             plant = self.entities[idx]
             y, x = plant.location
 
-            # process choices of one plant
-            repr, send_e, set_inf = plant.choices(self.light[plant.location], self.life, self.infos, self.nutrients)
+            if self.lazy_nutrients:
+                self.restore_nutrients(y, x)
+            self.profiler.mark("restore")
+
+            # process choices of one plant, timed as sensing, think and accounting
+            repr, send_e, set_inf = plant.choices(self.light[plant.location], self.life, self.infos, self.nutrients, profiler=self.profiler)
 
             # check whether the plant died, or random death
-            if not plant.alive or np.random.uniform() < self.config["death_chance"]: 
+            if not plant.alive or deaths[idx]:
                 self.life[y,x] = 0
                 dead_entities.append(plant)
 
@@ -73,22 +239,131 @@ class World():
             for idx in range(4):
                 dy, dx = self.dirs[idx]
                 new_loc = ((y+dy) % self.pix_y, (x+dx) % self.pix_x)
-                
+
                 if repr[idx] == 1 and self.life[new_loc] == 0: # check to add new plant?
-                    new_entities.append(plants.PlantCell(self.config, new_loc, plant.genome, energy=1.0))
+                    new_entities.append(plants.PlantCell(self.config, new_loc, plant.genome, energy=1.0, rng=self.rng, cache=self.think_cache))
                     self.life[new_loc] = 1
+            self.profiler.mark("reproduction")
 
-                new_energies[new_loc] += send_e[idx] # spread energy
+            for idx in range(4):
+                dy, dx = self.dirs[idx]
+                new_energies[(y+dy) % self.pix_y, (x+dx) % self.pix_x] += send_e[idx] # spread energy
 
             # set plant info
             new_infos[y, x] = set_inf
+            self.profiler.mark("energy")
 
 
         # update informations and energies for new turn
         self.infos = new_infos
         self.energies = new_energies
+        self.profiler.mark("energy")
 
         # remove killed entities, add new ones
         for ent in dead_entities:
             self.entities.remove(ent)
-        self.entities += new_entities
\ No newline at end of file
+        self.entities += new_entities
+        if self.changes is not None:
+            self._log_changes(np.array([ent.location for ent in dead_entities], dtype=np.int64).reshape(-1, 2))
+            self._log_changes(np.array([ent.location for ent in new_entities], dtype=np.int64).reshape(-1, 2), np.array([ent.genome.color for ent in new_entities], dtype=np.uint8).reshape(-1, 3))
+        self.profiler.mark("removal")
+
+        self.profiler.count("births", len(new_entities))
+        self.profiler.count("deaths", len(dead_entities))
+        self.profiler.count("population", len(self.entities))
+        self.profiler.stop()
+
+
+class ArrayWorld(World):
+    """ World whose plants live in a structure-of-arrays PlantPopulation instead
+    of one PlantCell object each, such that a turn is a handful of whole-population
+    array operations.
+    """
+    def _seed(self, locations):
+        """ create the starting plants, all genomes are generated in one go
+
+        Args:
+            locations (np.array): (N, 2) array of (y, x) locations of the starting plants
+        """
+        self.population = population.PlantPopulation(self.config, capacity=max(len(locations), 1024), rng=self.rng)
+        self.population.seed(locations, energy=1)
+        self.population.profiler = self.profiler
+        return
+
+    def get_plants(self):
+        """ returns locations and colors of all living plants, e.g. for rendering
+
+        Returns:
+            tuple(np.array, np.array): (N, 2) array of (y, x) locations and (N, 3) array of RGB colors
+        """
+        pop = self.population
+        return pop.location[:pop.size].copy(), pop.genomes.color[pop.genome_slot[:pop.size]]
+
+    def update(self):
+        """ update all life in the world at one time step
+
+        NB:
+        Plants sense the world as it was at the start of the step (see
+        PlantPopulation.choices). Births are decided for all plants at once with
+        a random priority standing in for the random update order, see
+        reproduction.resolve.
+        """
+
+        # preprocess plant pass
+        self.profiler.start()
+        self.world_age += 1
+
+        if not self.lazy_nutrients:
+            self.flush_nutrients() # restore nutrients
+
+        pop = self.population
+        n = pop.size
+        locations = pop.location[:n]
+        y = locations[:, 0]
+        x = locations[:, 1]
+        if self.lazy_nutrients:
+            self.restore_nutrients(y, x)
+        self.profiler.mark("restore")
+
+        priority = self.rng.permutation(n) # set random update order
+        dead = self.rng.uniform(size=n) < self.config["death_chance"] # random deaths
+        self.profiler.mark("permutation")
+
+        new_energies = np.zeros_like(self.light)
+        new_infos = np.zeros_like(self.infos)
+
+        # process choices of all plants, timed as sensing, think and accounting
+        repr, send_e, set_inf = pop.choices(self.light[y, x], self.life, self.infos, self.nutrients)
+
+        # check whether the plant died, or random death
+        dead |= ~pop.alive[:n]
+
+        # process the plants decisions
+        ny, nx = pop.neighbours()
+        births, parents = reproduction.resolve(repr, send_e, ny, nx, locations, dead, priority, self.life)
+        self.life[y[dead], x[dead]] = 0
+        self.life[births[:, 0], births[:, 1]] = 1
+        self.profiler.mark("reproduction")
+
+        # spread energy, set plant info
+        reproduction.spread_energy(send_e, ny, nx, new_energies)
+        new_infos[y, x] = set_inf
+
+        # update informations and energies for new turn
+        self.infos = new_infos
+        self.energies = new_energies
+        self.profiler.mark("energy")
+
+        # remove killed plants, add new ones
+        pop.spawn(births, parents, energy=1.0)
+        if self.changes is not None:
+            self._log_changes(locations[dead])
+            self._log_changes(births, pop.genomes.color[pop.genome_slot[n:pop.size]])
+        pop.remove(np.concatenate([dead, np.zeros(len(parents), dtype=bool)]))
+        self.profiler.mark("removal")
+
+        self.profiler.count("births", len(parents))
+        self.profiler.count("deaths", int(np.sum(dead)))
+        self.profiler.count("population", pop.size)
+        self.profiler.stop()
+        return
@@ -1,27 +1,52 @@
 import scipy
 import pygame
 import numpy as np
-import sys, time
-import utils
+import sys, os
+import utils, rules, bitlife, hashlife, sparse, parallel
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "common"))
+import recorder, renderer, runner, viewport
 
 
 class Conways():
 
-    def __init__(self, initial_config=None, size=None):
+    def __init__(self, initial_config=None, size=None, rule="B3/S23", kernel=None, compact=False):
         """ initialization
 
         the Game Of Life class
 
+        NB:
+        Any Life-like rule string works, e.g. "B36/S23" (HighLife) or "B2/S"
+        (Seeds), see rules.parse(). update() looks the next state of all cells
+        up in one pass, in a table indexed by life * (max count + 1) + count.
+        kernel weights the neighbours of the count, e.g. rules.moore(2) for a
+        5 x 5 neighbourhood; the rule may then use counts up to its sum.
+
+        compact=True is for huge grids: life is uint8 and pixel_age a uint8
+        that saturates at 255, which stands for 255 or more steps (and never
+        alive), so a cell costs 2 bytes. update() then steps blocks of rows in
+        place with uint8 counts instead of one float convolution of the whole
+        grid, and the grayscale comes from a 256 entry table per age_factor.
+        It only supports the 8 neighbours of the default kernel.
+
+        row_time holds the generation each row last changed in, so a display
+        can redraw only the rows that changed since it last looked.
+
         Args:
             pix_x (int): width of world
             pix_y (int): height of world
             initial_config (np.array, optional): Initial configuration for conways. Defaults to None.
+            rule (string, optional): Life-like rule string. Defaults to "B3/S23".
+            kernel (np.array, optional): integer neighbour kernel, if None the 8 neighbours (rules.moore(1)). Defaults to None.
+            compact (bool, optional): low-memory mode with uint8 life and ages. Defaults to False.
+
+        Raises:
+            ValueError: raised for compact=True with another kernel than the default one
         """
 
         # set initial config
         if initial_config is None:
-            assert len(size) == 2 and type(size) == type((0,)), "Not a vali"
-            self.life = np.zeros(size)
+            assert len(size) == 2 and type(size) == type((0,)), "Not a valid size"
+            self.life = np.zeros(size, dtype=np.uint8 if compact else np.float64)
             self.size = size
         else:
             assert initial_config is not None, "Too few parameters passed, either initial_config or size"
@@ -29,48 +54,160 @@ class Conways():
             self.size = initial_config.shape
         
         # used for convolution in update()
-        self.filter = np.array([[1, 1, 1], [1, 0, 1], [1, 1, 1]])
-        self.pixel_age = np.infty * np.ones_like(initial_config)
+        self.filter = rules.moore(1) if kernel is None else np.asarray(kernel, dtype=int)
+        self.rule = rule
+        self.max_count = int(self.filter.sum())
+        self.table = rules.table(rule, self.max_count) # next state per life * (max_count + 1) + count
+        self.compact = compact
+        self.generation = 0
+        self.row_time = np.zeros(self.size[0], dtype=np.int64) # generation of the last change per row
+        if compact:
+            if self.filter.shape != (3, 3) or not np.array_equal(self.filter, rules.moore(1)):
+                raise ValueError("compact=True only supports the default kernel")
+            if initial_config is not None:
+                self.life = (self.life != 0).view(np.uint8) # no second copy of a huge grid
+            self.pixel_age = np.full(self.size, 255, dtype=np.uint8)
+            self.gray_tables = {} # (age_factor, 8 bit) -> table per age
+        else:
+            self.pixel_age = np.inf * np.ones(self.size)
         return
     
 
     def update(self):
         """ implementation of one step of conways
         """
+        self.generation += 1
+        if self.compact:
+            self._update_compact()
+            return
 
         # find neighbors of all positions
         num_neighbs = scipy.signal.convolve2d(self.life, self.filter, mode="same", boundary="wrap")
 
-        # update rules
-        self.life[np.logical_and(self.life == 1, num_neighbs < 2)] = 0
-        self.life[np.logical_and(self.life == 1, num_neighbs > 3)] = 0
-        self.life[np.logical_and(self.life == 0, num_neighbs == 3)] = 1
+        # update rules, one lookup per cell
+        code = (self.max_count + 1) * self.life.astype(np.intp) + num_neighbs.astype(np.intp)
+        new = self.table[code]
+        self.row_time[(new != self.life).any(axis=1)] = self.generation
+        self.life[...] = new
 
         self.pixel_age += 1
         self.pixel_age[self.life == 1] = 0
         return
-    
+
+
+    def _update_compact(self, rows_per_block=None):
+        # one step in place, a block of rows at a time, keeping the old rows its neighbours need
+        h, w = self.size
+        rows_per_block = rows_per_block or max(1, 2**22 // w)
+        first = self.life[0].copy()
+        above = self.life[-1].copy()
+
+        for r0 in range(0, h, rows_per_block):
+            r1 = min(r0 + rows_per_block, h)
+            below = self.life[r1] if r1 < h else first
+            block = np.concatenate([above[None], self.life[r0:r1], below[None]])
+
+            # sums of every cell and its left and right neighbour, then of three such rows
+            row_sums = block.copy()
+            row_sums[:, 1:] += block[:, :-1]
+            row_sums[:, 0] += block[:, -1]
+            row_sums[:, :-1] += block[:, 1:]
+            row_sums[:, -1] += block[:, 0]
+            num_neighbs = row_sums[:-2] + row_sums[1:-1] + row_sums[2:] - block[1:-1]
+
+            above = self.life[r1 - 1].copy()
+            code = num_neighbs
+            code += (self.max_count + 1) * block[1:-1] # < 256 for the 8 neighbours
+            new = self.table[code]
+            self.row_time[r0:r1][(new != block[1:-1]).any(axis=1)] = self.generation
+            self.life[r0:r1] = new
+
+            age = self.pixel_age[r0:r1]
+            age += age < 255 # saturating
+            age[new == 1] = 0
+        return
+
+
+    def _gray_table(self, age_factor, gray8):
+        # grayscale per uint8 age, 255 counts as infinitely old
+        key = (age_factor, gray8)
+        if key not in self.gray_tables:
+            table = age_factor ** np.arange(256, dtype=np.float64)
+            table[255] = 0
+            self.gray_tables[key] = (255 * table).astype(np.uint8) if gray8 else table
+        return self.gray_tables[key]
+
+
     def get_grayscale(self, with_age=False, age_factor=0.5):
 
         if with_age:
+            if self.compact:
+                return self._gray_table(age_factor, False)[self.pixel_age] # one lookup per pixel
             return np.exp(np.log(age_factor) * self.pixel_age) # grayscale value of aged pixels
         
         else:
             return self.life
+
+
+    def get_gray8(self, with_age=False, age_factor=0.5, rows=None):
+        """ get_grayscale() as uint8 in [0, 255], e.g. for a grayscale viewport.Pyramid
+
+        NB: in compact mode no float array of the grid size is made
+
+        Args:
+            with_age (bool, optional): fade out dead cells with the steps since they were alive. Defaults to False.
+            age_factor (float, optional): fading per step. Defaults to 0.5.
+            rows (slice, optional): only these rows, e.g. those that changed (see row_time). Defaults to None.
+
+        Returns:
+            np.array: (H, W) uint8 array, (h, W) for rows
+        """
+        rows = slice(None) if rows is None else rows
+        if self.compact:
+            if with_age:
+                return self._gray_table(age_factor, True)[self.pixel_age[rows]]
+            return self.life[rows] * np.uint8(255)
+
+        if with_age:
+            gray = np.exp(np.log(age_factor) * self.pixel_age[rows])
+        else:
+            gray = self.life[rows]
+        return (255 * np.clip(gray, 0, 1)).astype(np.uint8)
+
+    def get_frame(self):
+        """ the state of the world, e.g. for a recorder.Recorder
+
+        Returns:
+            dict: life as uint8
+        """
+        return {"life" : self.life.astype(np.uint8)}
     
 
 
 if __name__ == "__main__":
     SIM_PIX_SIZE = 8
-    UPDATE_TIME = 5e-2 # seconds
-    WHITE = np.array([255, 255, 255])
+    FPS = 20 # displayed frames per second
+    STEPS_PER_FRAME = 1 # simulation steps per displayed frame, None to simulate as fast as possible
+    RECORD = None # directory to record the run to, replay with common/recorder.py
+    RULE = "B3/S23" # Life-like rule, e.g. "B36/S23" for HighLife, not for the "bits" and "hashlife" backends
+    BACKEND = "arrays" # "arrays": Conways, "bits": bitlife.BitConways, 64 cells per word, "hashlife": hashlife.HashConways (power of two sizes), "sparse": sparse.SparseConways, "parallel": parallel.ParallelConways, "compact": Conways(compact=True), 2 bytes per cell
 
     img_arr = utils.get_array_for_conway("procedural_generation/berry.png")
-    world = Conways(initial_config=img_arr)
+    if BACKEND == "bits":
+        world = bitlife.BitConways(initial_config=img_arr)
+    elif BACKEND == "hashlife":
+        world = hashlife.HashConways(initial_config=img_arr)
+    elif BACKEND == "sparse":
+        world = sparse.SparseConways(initial_config=img_arr, rule=RULE)
+    elif BACKEND == "parallel":
+        world = parallel.ParallelConways(initial_config=img_arr, workers=None, rule=RULE) # one strip per core
+    else:
+        world = Conways(initial_config=img_arr, rule=RULE, compact=(BACKEND == "compact"))
+    rec = recorder.Recorder(RECORD) if RECORD is not None else None
 
     num_sim_pix_y, num_sim_pix_x = world.size
-    SCREEN_SIZE_X = num_sim_pix_x * SIM_PIX_SIZE
-    SCREEN_SIZE_Y = num_sim_pix_y * SIM_PIX_SIZE
+    SCREEN_SIZE_X = min(num_sim_pix_x * SIM_PIX_SIZE, 1024) # bigger worlds are panned and zoomed, see viewport.py
+    SCREEN_SIZE_Y = min(num_sim_pix_y * SIM_PIX_SIZE, 1024)
 
 
     pygame.init()
@@ -78,31 +215,85 @@ if __name__ == "__main__":
     pygame.display.set_caption("The Classic Game of Life")
 
 
-    running = True
-    screen.fill((0,0,0))
-    while running:
-        time.sleep(UPDATE_TIME)
-
-        # update world and get color vals
+    def step():
         world.update()
-        graysc = world.get_grayscale(with_age=True, age_factor=0.3)
+        if rec is not None:
+            rec.step(world)
+
+    # the world image and its zoomed out levels, updated in the simulation thread
+    pyramid = viewport.Pyramid(world.size, reduce="max", channels=1) # grayscale, 1 byte per cell
+    view = viewport.Viewport(world.size, (SCREEN_SIZE_X, SCREEN_SIZE_Y), zoom=SIM_PIX_SIZE)
+
+    AGE_FACTOR = 0.3
+    FADE = int(np.log(255) / -np.log(AGE_FACTOR)) + 1 # steps until a dead cell is drawn black
+    BAND = max(pyramid.block, 2**20 // num_sim_pix_x // pyramid.block * pyramid.block) # rows drawn at once
+    shown_generation = None # generation of the last snapshot
 
-        for y in range(num_sim_pix_y):
-            for x in range(num_sim_pix_x):
-                screen_x = x * SIM_PIX_SIZE
-                screen_y = y * SIM_PIX_SIZE
+    def changed_rows():
+        # rows that may look different than at the last snapshot
+        if shown_generation is None:
+            return np.ones(num_sim_pix_y, dtype=bool)
+        if BACKEND == "sparse":
+            tiles = (world.change_time > shown_generation - FADE).any(axis=1)
+            return np.repeat(tiles, world.tile)[:num_sim_pix_y]
+        return world.row_time > shown_generation - FADE
 
-                pixel_color = tuple(WHITE * graysc[y, x])
+    def get_image(rows):
+        # uint8 grayscale of some rows
+        if BACKEND in ("arrays", "compact"):
+            return world.get_gray8(with_age=True, age_factor=AGE_FACTOR, rows=rows)
+        elif BACKEND in ("sparse", "parallel"):
+            gray = world.get_grayscale(with_age=True, age_factor=AGE_FACTOR, rows=rows)
+        else:
+            gray = world.get_grayscale(with_age=True, age_factor=AGE_FACTOR)
+        return (255 * np.clip(gray, 0, 1)).astype(np.uint8)
+
+    def snapshot():
+        global shown_generation
+        if BACKEND in ("bits", "hashlife"):
+            bands = [(0, num_sim_pix_y)] # no change tracking, always the whole world
+        else:
+            # bands of rows with a change in them
+            hit = np.add.reduceat(changed_rows(), np.arange(0, num_sim_pix_y, BAND))
+            bands = [(r0, min(r0 + BAND, num_sim_pix_y)) for r0 in np.flatnonzero(hit) * BAND]
 
-                # draw the simulated pixel on the screen
-                pygame.draw.rect(screen, pixel_color, (screen_x, screen_y, SIM_PIX_SIZE, SIM_PIX_SIZE))
+        for r0, r1 in bands:
+            image = get_image(slice(r0, r1))
+            with pyramid.lock:
+                pyramid.set(image, y=r0)
+        with pyramid.lock:
+            pyramid.refresh()
+        shown_generation = getattr(world, "generation", None)
+        return True
+
+    # the simulation runs in its own thread, the display shows its snapshots at FPS
+    sim = runner.Runner(step, snapshot, steps_per_frame=STEPS_PER_FRAME)
+    canvas = renderer.Renderer(screen, 1)
+    clock = pygame.time.Clock()
+
+    running = True
+    shown = None # view of the last drawn frame
+    screen.fill((0,0,0))
+    sim.start()
+    while running:
+        # draw the visible part of the world at screen resolution
+        if sim.frame() is not None or view.view != shown:
+            shown = view.view
+            canvas.draw(view.render(pyramid))
 
 
         for event in pygame.event.get(): # exit condition
             if event.type == pygame.QUIT:
                 running = False
+            view.handle(event)
 
-        pygame.display.flip()
+        canvas.present()
+        clock.tick(FPS)
 
+    sim.stop()
+    if rec is not None:
+        rec.close()
+    if BACKEND == "parallel":
+        world.close()
     pygame.quit()
     sys.exit()
\ No newline at end of file
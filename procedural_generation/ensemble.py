@@ -0,0 +1,165 @@
+import numpy as np
+import rules
+
+
+class ConwaysEnsemble():
+
+    def __init__(self, worlds=None, num=None, size=None, density=0.3, seed=None, rule="B3/S23", max_period=8):
+        """ many small Game Of Life worlds stepped together as one (B, H, W) array
+
+        NB:
+        update() counts the neighbours of all worlds in one vectorized pass
+        (each world wraps on its own) and looks the next states up in the
+        rules.table() of the rule. After every step it reports per world the
+        population, whether it is extinct and the smallest period p <= max_period
+        with the same state p steps ago (1 is stable, > 1 oscillating, 0 none
+        yet); the last max_period states are kept bit-packed for that. A world
+        that is extinct or periodic never changes its behaviour again, it is
+        finished. drop_finished() moves those into results, so the batch only
+        holds worlds that still need stepping. ids maps the batch back to the
+        index of every world in the initial ensemble.
+
+        Args:
+            worlds (np.array, optional): (B, H, W) initial configurations, nonzero is alive. Defaults to None.
+            num (int, optional): B, number of random worlds, if worlds is None. Defaults to None.
+            size (tuple, optional): (H, W) of the random worlds. Defaults to None.
+            density (float, optional): chance of a cell of a random world to be alive. Defaults to 0.3.
+            seed (int, optional): seed of the random worlds. Defaults to None.
+            rule (string, optional): Life-like rule string, see rules.parse(). Defaults to "B3/S23".
+            max_period (int, optional): longest period detected. Defaults to 8.
+        """
+        if worlds is None:
+            rng = np.random.default_rng(seed)
+            worlds = rng.random((num,) + tuple(size)) < density
+
+        self.worlds = (np.asarray(worlds) != 0).astype(np.uint8)
+        self.size = self.worlds.shape[1:]
+        self.table = rules.table(rule) # next state per life * 9 + count
+        self.max_period = max_period
+        self.generation = 0
+
+        self.ids = np.arange(len(self.worlds))
+        self.history = [] # packed states of the last max_period generations, newest first
+        self.stats = self._stats(np.zeros(len(self.worlds), dtype=np.int64))
+        self.results = {} # id -> final stats of a dropped world
+        return
+
+
+    def _pack(self):
+        # one row of bytes per world, for comparing whole states at once
+        return np.packbits(self.worlds.reshape(len(self.worlds), -1), axis=1)
+
+
+    def _stats(self, period):
+        population = self.worlds.sum(axis=(1, 2), dtype=np.int64)
+        return {
+            "population" : population,
+            "extinct" : population == 0,
+            "stable" : period == 1,
+            "oscillating" : period > 1,
+            "period" : period,
+        }
+
+
+    def update(self):
+        """ one step of all worlds
+
+        Returns:
+            dict: per world of the batch arrays "population", "extinct", "stable", "oscillating" and "period"
+        """
+        x = self.worlds
+        self.history = [self._pack()] + self.history[:self.max_period - 1]
+
+        # sums of every cell and its left and right neighbour, then of three such rows, less the cell
+        row_sums = x + np.roll(x, 1, axis=2) + np.roll(x, -1, axis=2)
+        num_neighbs = row_sums + np.roll(row_sums, 1, axis=1) + np.roll(row_sums, -1, axis=1) - x
+
+        num_neighbs += 9 * x
+        self.worlds = self.table[num_neighbs]
+        self.generation += 1
+
+        # smallest period with the same state as now
+        now = self._pack()
+        period = np.zeros(len(x), dtype=np.int64)
+        for p, old in enumerate(self.history, start=1):
+            same = (period == 0) & (old == now).all(axis=1)
+            period[same] = p
+
+        self.stats = self._stats(period)
+        return self.stats
+
+
+    def finished(self):
+        """ boolean array of the worlds of the batch that are extinct or periodic
+        """
+        return self.stats["extinct"] | (self.stats["period"] > 0)
+
+
+    def drop(self, mask):
+        """ remove worlds from the batch, keeping their final stats in results
+
+        NB: the stats of a world are those of its last step, with the generation it was dropped at
+
+        Args:
+            mask (np.array): (B,) boolean array of the worlds to remove
+        """
+        for i in np.nonzero(mask)[0]:
+            self.results[int(self.ids[i])] = {"generation" : self.generation, **{key : value[i].item() for key, value in self.stats.items()}}
+
+        keep = ~mask
+        self.worlds = self.worlds[keep]
+        self.ids = self.ids[keep]
+        self.history = [old[keep] for old in self.history]
+        self.stats = {key : value[keep] for key, value in self.stats.items()}
+        return
+
+
+    def drop_finished(self):
+        """ remove the finished worlds from the batch
+
+        Returns:
+            int: number of dropped worlds
+        """
+        mask = self.finished()
+        self.drop(mask)
+        return int(mask.sum())
+
+
+    def run(self, steps, drop=True):
+        """ step until all worlds are finished or for a number of steps
+
+        Args:
+            steps (int): maximum number of steps
+            drop (bool, optional): drop finished worlds after every step. Defaults to True.
+
+        Returns:
+            dict: id -> final stats of the finished worlds, see results
+        """
+        for _ in range(steps):
+            if len(self.worlds) == 0:
+                break
+            self.update()
+            if drop:
+                self.drop_finished()
+        return self.results
+
+
+
+if __name__ == "__main__":
+    # SET SOME PARAMS HERE
+    NUM_WORLDS = 2000
+    SIZE = (32, 32)
+    DENSITY = 0.3
+    STEPS = 2000
+    SEED = 0
+
+    ensemble = ConwaysEnsemble(num=NUM_WORLDS, size=SIZE, density=DENSITY, seed=SEED)
+    results = ensemble.run(STEPS)
+
+    generations = np.array([r["generation"] for r in results.values()])
+    periods = np.array([r["period"] for r in results.values()])
+    extinct = np.array([r["extinct"] for r in results.values()])
+    print("finished", len(results), "of", NUM_WORLDS, "worlds, still running", len(ensemble.worlds))
+    if len(results) > 0:
+        print("extinct", int(extinct.sum()), ", stable", int(np.sum(~extinct & (periods == 1))), ", oscillating", int(np.sum(periods > 1)))
+        print("generations to finish: mean", generations.mean(), ", max", generations.max())
@@ -0,0 +1,380 @@
+import numpy as np
+
+
+class Node():
+    __slots__ = ("k", "a", "b", "c", "d", "n")
+
+    def __init__(self, k, a, b, c, d, n):
+        """ quadtree node of a 2**k x 2**k square, only created by HashConways.join()
+
+        Args:
+            k (int): level, 0 is a single cell
+            a (Node): north-west quadrant, None on level 0
+            b (Node): north-east quadrant
+            c (Node): south-west quadrant
+            d (Node): south-east quadrant
+            n (int): number of living cells
+        """
+        self.k = k
+        self.a, self.b, self.c, self.d = a, b, c, d
+        self.n = n
+        return
+
+
+
+class HashConways():
+
+    def __init__(self, initial_config=None, size=None, torus=True, max_nodes=500000):
+        """ the Game Of Life with HashLife, for jumping far into the future
+
+        NB:
+        The world is a quadtree of hash-consed nodes: join() returns the same
+        Node for the same four quadrants, so repeated structure (empty space,
+        still lifes, the copies of a glider) is stored once. The result of
+        advancing a node by 2**j generations is memoized per (node, j), so
+        periodic and sparse patterns advance 2**j generations in about the time
+        the first occurrence of each distinct block took. advance(n) makes
+        one such jump per set bit of n.
+
+        With torus=True the world wraps like Conways. This is exact, but only
+        for power of two sizes: the torus is tiled into a larger square, which
+        hash-consing stores in a few nodes per level, and the center of its
+        future is cut back to one period. With torus=False the world is an
+        infinite plane with the initial config at (0, 0) and dead cells all
+        around, works for any size, and the window of get_grayscale() is the
+        initial (H, W) unless another window is given.
+
+        The node table and the memoized results are bounded by max_nodes:
+        once they outgrow it, everything not reachable from the current state
+        is dropped together with all memoized results (mark and sweep) before
+        the next jump. A single jump may exceed the bound until it finishes.
+        Only B3/S23 is supported and no ages are tracked.
+
+        Args:
+            initial_config (np.array, optional): Initial configuration, (H, W) array, nonzero is alive. Defaults to None.
+            size (tuple, optional): (H, W) of an empty world, if initial_config is None. Defaults to None.
+            torus (bool, optional): wrap around the edges, otherwise an infinite plane. Defaults to True.
+            max_nodes (int, optional): bound of the node table plus memoized results. Defaults to 500000.
+
+        Raises:
+            ValueError: raised for torus=True and a size that is not a power of two
+        """
+        if initial_config is None:
+            assert len(size) == 2 and type(size) == type((0,)), "Not a valid size"
+            initial_config = np.zeros(size, dtype=np.uint8)
+
+        life = np.asarray(initial_config) != 0
+        self.size = tuple(life.shape)
+        self.torus = torus
+        self.max_nodes = max_nodes
+        self.generation = 0
+
+        self.nodes = {} # (a, b, c, d) -> Node, the hash-consing table
+        self.results = {} # (Node, j) -> Node advanced by 2**j
+        self.cells = (Node(0, None, None, None, None, 0), Node(0, None, None, None, None, 1))
+        self.empties = [self.cells[0]] # empty node per level
+
+        if torus:
+            h, w = self.size
+            if h & (h - 1) != 0 or w & (w - 1) != 0:
+                raise ValueError("torus=True needs power of two sizes, not " + str(self.size) + ", use torus=False")
+
+            # a smaller side is tiled up, which keeps the world periodic
+            side = max(h, w, 4)
+            life = np.tile(life, (side // h, side // w))
+        else:
+            side = 4
+            while side < max(self.size):
+                side *= 2
+
+            padded = np.zeros((side, side), dtype=bool)
+            padded[:self.size[0], :self.size[1]] = life
+            life = padded
+
+        self.root = self._build(life)
+        self.origin = (0, 0) # world coordinates of the north-west corner of root
+        return
+
+
+    def empty(self, k):
+        """ the empty node of level k
+        """
+        while len(self.empties) <= k:
+            e = self.empties[-1]
+            self.empties.append(self.join(e, e, e, e))
+        return self.empties[k]
+
+
+    def join(self, a, b, c, d):
+        """ the canonical node of four quadrants of the same level
+
+        Args:
+            a (Node): north-west
+            b (Node): north-east
+            c (Node): south-west
+            d (Node): south-east
+
+        Returns:
+            Node: node one level up
+        """
+        key = (a, b, c, d)
+        node = self.nodes.get(key)
+        if node is None:
+            node = Node(a.k + 1, a, b, c, d, a.n + b.n + c.n + d.n)
+            self.nodes[key] = node
+        return node
+
+
+    def _build(self, life):
+        # quadtree of a 2**k x 2**k boolean array, empty blocks are shared
+        side = life.shape[0]
+        if side == 1:
+            return self.cells[int(life[0, 0])]
+
+        k = side.bit_length() - 1
+        if not life.any():
+            return self.empty(k)
+
+        h = side // 2
+        return self.join(self._build(life[:h, :h]), self._build(life[:h, h:]), self._build(life[h:, :h]), self._build(life[h:, h:]))
+
+
+    def _center(self, m):
+        # the middle quarter of m, one level down
+        return self.join(m.a.d, m.b.c, m.c.b, m.d.a)
+
+
+    def _life_4x4(self, m):
+        # the 2 x 2 center of a level 2 node after one generation
+        rows = [
+            [m.a.a.n, m.a.b.n, m.b.a.n, m.b.b.n],
+            [m.a.c.n, m.a.d.n, m.b.c.n, m.b.d.n],
+            [m.c.a.n, m.c.b.n, m.d.a.n, m.d.b.n],
+            [m.c.c.n, m.c.d.n, m.d.c.n, m.d.d.n],
+        ]
+        new = []
+        for y in (1, 2):
+            for x in (1, 2):
+                count = sum(rows[y + dy][x + dx] for dy in (-1, 0, 1) for dx in (-1, 0, 1)) - rows[y][x]
+                new.append(self.cells[int(count == 3 or (count == 2 and rows[y][x] == 1))])
+        return self.join(*new)
+
+
+    def successor(self, m, j):
+        """ the center of a node advanced by 2**j generations
+
+        Args:
+            m (Node): node of level k >= 2
+            j (int): log2 of the generations, at most k - 2
+
+        Returns:
+            Node: the middle 2**(k-1) x 2**(k-1) square after 2**j generations, level k - 1
+        """
+        if m.n == 0:
+            return m.a
+
+        key = (m, j)
+        result = self.results.get(key)
+        if result is not None:
+            return result
+
+        if m.k == 2:
+            result = self._life_4x4(m)
+        else:
+            join = self.join
+            a, b, c, d = m.a, m.b, m.c, m.d
+
+            # nine overlapping sub-squares of level k - 1
+            subs = [
+                a, join(a.b, b.a, a.d, b.c), b,
+                join(a.c, a.d, c.a, c.b), self._center(m), join(b.c, b.d, d.a, d.b),
+                c, join(c.b, d.a, c.d, d.c), d,
+            ]
+            if j < m.k - 2:
+                # advance each by 2**j, then stitch the centers of the results
+                c1, c2, c3, c4, c5, c6, c7, c8, c9 = [self.successor(s, j) for s in subs]
+                result = join(
+                    join(c1.d, c2.c, c4.b, c5.a), join(c2.d, c3.c, c5.b, c6.a),
+                    join(c4.d, c5.c, c7.b, c8.a), join(c5.d, c6.c, c8.b, c9.a))
+            else:
+                # advance each by 2**(k-3), then four overlapping squares by 2**(k-3) again
+                c1, c2, c3, c4, c5, c6, c7, c8, c9 = [self.successor(s, j - 1) for s in subs]
+                result = join(
+                    self.successor(join(c1, c2, c4, c5), j - 1), self.successor(join(c2, c3, c5, c6), j - 1),
+                    self.successor(join(c4, c5, c7, c8), j - 1), self.successor(join(c5, c6, c8, c9), j - 1))
+
+        self.results[key] = result
+        return result
+
+
+    def _expand(self, m):
+        # m in the middle of an empty node of the next level
+        e = self.empty(m.k - 1)
+        return self.join(self.join(e, e, e, m.a), self.join(e, e, m.b, e), self.join(e, m.c, e, e), self.join(m.d, e, e, e))
+
+
+    def _tile(self, m, k):
+        # the torus m repeated into a node of level k
+        while m.k < k:
+            m = self.join(m, m, m, m)
+        return m
+
+
+    def _collect(self):
+        # mark and sweep: keep what the current state is made of, forget all results
+        keep = {}
+        stack = [self.root] + self.empties[1:]
+        while len(stack) > 0:
+            m = stack.pop()
+            if m.k == 0:
+                continue
+            key = (m.a, m.b, m.c, m.d)
+            if key not in keep:
+                keep[key] = m
+                stack.extend(key)
+
+        self.nodes = keep
+        self.results = {}
+        return
+
+
+    def jump(self, j):
+        """ advance by 2**j generations at once
+
+        Args:
+            j (int): log2 of the generations
+        """
+        if len(self.nodes) + len(self.results) > self.max_nodes:
+            self._collect()
+
+        if self.torus:
+            # the torus tiled into a square of four of level m, its center after 2**j generations
+            # is again a tiling of the torus, shifted by 2**(m-1)
+            k = self.root.k
+            m = max(k, j + 1)
+            tiled = self._tile(self.root, m)
+            result = self.successor(self.join(tiled, tiled, tiled, tiled), j)
+            while result.k > k:
+                result = result.a
+            if m == k:
+                result = self.join(result.d, result.c, result.b, result.a)
+            self.root = result
+        else:
+            # grow until the pattern sits in the middle quarter with a margin of 2**j
+            root = self.root
+            oy, ox = self.origin
+            while root.k < j + 3 or self._center(self._center(root)).n != root.n:
+                oy, ox = oy - 2**(root.k - 1), ox - 2**(root.k - 1)
+                root = self._expand(root)
+
+            self.root = self.successor(root, j)
+            self.origin = (oy + 2**(root.k - 2), ox + 2**(root.k - 2))
+
+        self.generation += 2**j
+        return
+
+
+    def advance(self, n_generations):
+        """ advance by any number of generations, one jump() per set bit
+
+        Args:
+            n_generations (int): number of generations
+        """
+        j = 0
+        while n_generations > 0:
+            if n_generations & 1:
+                self.jump(j)
+            n_generations >>= 1
+            j += 1
+        return
+
+
+    def update(self):
+        """ one step of conways
+        """
+        self.jump(0)
+        return
+
+
+    def population(self):
+        """ number of living cells
+        """
+        if self.torus:
+            # the root may hold the torus tiled a few times
+            return self.root.n * self.size[0] * self.size[1] // 4**self.root.k
+        return self.root.n
+
+
+    def window(self, y, x, h, w):
+        """ materialize a rectangle of the world as an array
+
+        Args:
+            y (int): world row of the north-west corner
+            x (int): world column of the north-west corner
+            h (int): height
+            w (int): width
+
+        Returns:
+            np.array: (h, w) uint8 array of 0/1, wrapped on a torus and dead outside the pattern on a plane
+        """
+        out = np.zeros((h, w), dtype=np.uint8)
+        if self.torus:
+            # the root tiled over the window
+            side = 2**self.root.k
+            for ty in range(y - y % side, y + h, side):
+                for tx in range(x - x % side, x + w, side):
+                    self._fill(out, self.root, ty - y, tx - x)
+        else:
+            self._fill(out, self.root, self.origin[0] - y, self.origin[1] - x)
+        return out
+
+
+    def _fill(self, out, m, y, x):
+        # write node m with its north-west corner at (y, x) of out, skipping empty and outside blocks
+        side = 2**m.k
+        if m.n == 0 or y >= out.shape[0] or x >= out.shape[1] or y + side <= 0 or x + side <= 0:
+            return
+        if m.k == 0:
+            out[y, x] = 1
+            return
+
+        half = side // 2
+        self._fill(out, m.a, y, x)
+        self._fill(out, m.b, y, x + half)
+        self._fill(out, m.c, y + half, x)
+        self._fill(out, m.d, y + half, x + half)
+        return
+
+
+    @property
+    def life(self):
+        """ (H, W) float array of 0/1 of the initial area, like Conways.life
+        """
+        return self.window(0, 0, *self.size).astype(np.float64)
+
+
+    def get_grayscale(self, with_age=False, age_factor=0.5, window=None):
+        """ the world as an array in [0, 1]
+
+        NB: ages are not tracked across jumps, with_age and age_factor are only accepted for Conways compatibility
+
+        Args:
+            with_age (bool, optional): ignored. Defaults to False.
+            age_factor (float, optional): ignored. Defaults to 0.5.
+            window (tuple, optional): (y, x, h, w) rectangle, see window(), if None the initial (H, W). Defaults to None.
+
+        Returns:
+            np.array: (h, w) float array
+        """
+        if window is None:
+            window = (0, 0) + self.size
+        return self.window(*window).astype(np.float64)
+
+
+    def get_frame(self):
+        """ the state of the world, e.g. for a recorder.Recorder
+
+        Returns:
+            dict: life of the initial area as uint8
+        """
+        return {"life" : self.window(0, 0, *self.size)}
@@ -1,7 +1,8 @@
 import pygame
 import numpy as np
-import sys
-import time
+import sys, os
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "common"))
+import recorder, renderer, runner, viewport
 
 
 class CycleLangtons():
@@ -146,10 +147,30 @@ class CycleLangtons():
         return self.colors[self.life[y,x]]
 
 
+    def get_frame(self):
+        """ the state of the world, e.g. for a recorder.Recorder
+
+        Returns:
+            dict: life (color index per pixel) and the ant as (x, y, orientation)
+        """
+        return {"life" : self.life, "ant" : np.array([self.ant_x, self.ant_y, self.orientation], dtype=np.int64)}
+
+
+    def get_changed(self):
+        """ flat indices of the pixels changed by the last update, see self.changes
+
+        Returns:
+            dict: life -> flat indices
+        """
+        return {"life" : [y * self.pix_x + x for x, y in self.changes]}
+
+
 
 if __name__ == "__main__":
 
-    UPDATE_TIME = 0 # seconds
+    FPS = 60 # displayed frames per second
+    STEPS_PER_FRAME = None # simulation steps per displayed frame, None to simulate as fast as possible
+    RECORD = None # directory to record the run to, replay with common/recorder.py
     SIM_PIX_SIZE = 8 # how many real pixels is a simulated pixel long?
     num_sim_pix_y, num_sim_pix_x = (128, 128) # dimensions of world in simulated pixels
     rules = "RLLR" 
@@ -157,37 +178,64 @@ if __name__ == "__main__":
     # colors = [(0, 0, 0), (79, 160, 121), (58, 130, 111), (176, 112, 152)]
     ant_color = (255, 0, 0)
     world = CycleLangtons(num_sim_pix_x, num_sim_pix_y, rules=rules, colors=colors, ant_color=ant_color)
+    rec = recorder.Recorder(RECORD, palette=world.colors) if RECORD is not None else None
 
-    SCREEN_SIZE_X = num_sim_pix_x * SIM_PIX_SIZE
-    SCREEN_SIZE_Y = num_sim_pix_y * SIM_PIX_SIZE
+    SCREEN_SIZE_X = min(num_sim_pix_x * SIM_PIX_SIZE, 1024) # bigger worlds are panned and zoomed, see viewport.py
+    SCREEN_SIZE_Y = min(num_sim_pix_y * SIM_PIX_SIZE, 1024)
 
     pygame.init()
     screen = pygame.display.set_mode((SCREEN_SIZE_X, SCREEN_SIZE_Y)) 
     pygame.display.set_caption("One Upon A Time... there was a little ant that was fond of procedural generation")
 
 
-    running = True
-    screen.fill(world.colors[0])
-    while running:
-        time.sleep(UPDATE_TIME)
+    changed = set() # pixels changed since the last snapshot
+
+    def step():
         world.update()
+        changed.update(world.changes)
+        if rec is not None:
+            rec.step(world)
+
+    def snapshot():
+        cells = [(y, x) for x, y in changed]
+        changed.clear()
+        return cells, [world.get_color(x, y) for y, x in cells]
 
-        for elem in world.changes:
-            x, y = elem
-            # calculate the position of the simulated pixel on the screen
-            screen_x = x * SIM_PIX_SIZE
-            screen_y = y * SIM_PIX_SIZE
+    # the simulation runs in its own thread, the display shows its snapshots at FPS
+    sim = runner.Runner(step, snapshot, steps_per_frame=STEPS_PER_FRAME)
+    canvas = renderer.Renderer(screen, 1)
+    clock = pygame.time.Clock()
+
+    # the world image and its zoomed out levels, only the changed pixels are updated
+    pyramid = viewport.Pyramid((num_sim_pix_y, num_sim_pix_x), reduce="max")
+    pyramid.set(renderer.from_palette(world.life, world.colors))
+    view = viewport.Viewport((num_sim_pix_y, num_sim_pix_x), (SCREEN_SIZE_X, SCREEN_SIZE_Y), zoom=SIM_PIX_SIZE)
+
+    running = True
+    shown = None # view of the last drawn frame
+    sim.start()
+    while running:
+        frame = sim.frame()
+        if frame is not None:
+            pyramid.set_cells(*frame)
+            pyramid.refresh()
 
-            # get and draw the simulated pixel on the screen
-            pixel_color = world.get_color(x,y)
-            pygame.draw.rect(screen, pixel_color, (screen_x, screen_y, SIM_PIX_SIZE, SIM_PIX_SIZE))
+        # draw the visible part of the world at screen resolution
+        if frame is not None or view.view != shown:
+            shown = view.view
+            canvas.draw(view.render(pyramid))
 
 
         for event in pygame.event.get(): # exit condition
             if event.type == pygame.QUIT:
                 running = False
+            view.handle(event)
 
-        pygame.display.flip()
+        canvas.present()
+        clock.tick(FPS)
 
+    sim.stop()
+    if rec is not None:
+        rec.close()
     pygame.quit()
     sys.exit()
\ No newline at end of file
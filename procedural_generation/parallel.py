@@ -0,0 +1,131 @@
+import numpy as np
+import os
+from concurrent.futures import ThreadPoolExecutor
+import rules
+
+
+class ParallelConways():
+
+    def __init__(self, initial_config=None, size=None, workers=None, rule="B3/S23"):
+        """ the Game Of Life stepped in horizontal strips on a thread pool
+
+        NB:
+        The world is kept in two buffers of (H + 2, W + 2) cells, each with a
+        one cell toroidal halo ring that is refreshed after every step. Every
+        worker reads the rows of its strip plus the halo row above and below
+        from the current buffer and writes only its own rows of the other one,
+        so the strips never race and no strip is copied. The buffers are then
+        swapped. NumPy releases the GIL in its array operations, so the strips
+        of large worlds run in parallel on threads; small worlds are not worth
+        it. life, pixel_age, row_time and the rules are exactly those of
+        Conways.update().
+
+        Args:
+            initial_config (np.array, optional): Initial configuration for conways. Defaults to None.
+            size (tuple, optional): (H, W) of an empty world, if initial_config is None. Defaults to None.
+            workers (int, optional): number of threads and strips, if None os.cpu_count(). Defaults to None.
+            rule (string, optional): Life-like rule string, see rules.parse(). Defaults to "B3/S23".
+        """
+        if initial_config is None:
+            assert len(size) == 2 and type(size) == type((0,)), "Not a valid size"
+            initial_config = np.zeros(size)
+
+        self.size = initial_config.shape
+        self.workers = workers if workers is not None else (os.cpu_count() or 1)
+        self.workers = max(1, min(self.workers, self.size[0]))
+
+        h, w = self.size
+        self.buffers = [np.zeros((h + 2, w + 2), dtype=initial_config.dtype) for _ in range(2)]
+        self.buffers[0][1:-1, 1:-1] = initial_config
+        self._wrap(self.buffers[0])
+        self.pixel_age = np.inf * np.ones(self.size)
+        self.generation = 0
+        self.row_time = np.zeros(h, dtype=np.int64) # generation of the last change per row
+        self.table = rules.table(rule) # next state per life * 9 + count
+
+        # row bounds of the strips, as even as possible
+        bounds = np.linspace(0, h, self.workers + 1).round().astype(int)
+        self.strips = list(zip(bounds[:-1], bounds[1:]))
+        self.pool = ThreadPoolExecutor(max_workers=self.workers)
+        return
+
+
+    @property
+    def life(self):
+        """ (H, W) view of the current buffer without its halo
+        """
+        return self.buffers[0][1:-1, 1:-1]
+
+
+    def _wrap(self, padded):
+        # copy the opposite edges into the halo ring
+        padded[0, 1:-1] = padded[-2, 1:-1]
+        padded[-1, 1:-1] = padded[1, 1:-1]
+        padded[:, 0] = padded[:, -2]
+        padded[:, -1] = padded[:, 1]
+        return
+
+
+    def _step_strip(self, r0, r1):
+        # rows r0 to r1 of the world are rows r0 + 1 to r1 + 1 of the buffers
+        src = self.buffers[0][r0:r1 + 2]
+        h, w = r1 - r0, self.size[1]
+        num_neighbs = sum(src[1 + dy:1 + dy + h, 1 + dx:1 + dx + w] for dy in (-1, 0, 1) for dx in (-1, 0, 1) if dy != 0 or dx != 0)
+
+        old = src[1:-1, 1:-1]
+        new = self.buffers[1][r0 + 1:r1 + 1, 1:-1]
+        new[...] = self.table[9 * old.astype(np.intp) + num_neighbs.astype(np.intp)]
+        self.row_time[r0:r1][(new != old).any(axis=1)] = self.generation
+
+        age = self.pixel_age[r0:r1]
+        age += 1
+        age[new == 1] = 0
+        return
+
+
+    def update(self):
+        """ implementation of one step of conways, one strip per worker
+        """
+        self.generation += 1
+        futures = [self.pool.submit(self._step_strip, r0, r1) for r0, r1 in self.strips]
+        for future in futures:
+            future.result() # re-raises errors of the workers
+
+        self.buffers.reverse()
+        self._wrap(self.buffers[0])
+        return
+
+
+    def get_grayscale(self, with_age=False, age_factor=0.5, rows=None):
+        """ the world as an array in [0, 1]
+
+        Args:
+            with_age (bool, optional): fade out dead cells with the steps since they were alive. Defaults to False.
+            age_factor (float, optional): fading per step. Defaults to 0.5.
+            rows (slice, optional): only these rows, e.g. those that changed (see row_time). Defaults to None.
+
+        Returns:
+            np.array: (H, W) float array, (h, W) for rows
+        """
+        rows = slice(None) if rows is None else rows
+        if with_age:
+            return np.exp(np.log(age_factor) * self.pixel_age[rows]) # grayscale value of aged pixels
+
+        else:
+            return self.life[rows]
+
+
+    def get_frame(self):
+        """ the state of the world, e.g. for a recorder.Recorder
+
+        Returns:
+            dict: life as uint8
+        """
+        return {"life" : self.life.astype(np.uint8)}
+
+
+    def close(self):
+        """ shut the thread pool down
+        """
+        self.pool.shutdown()
+        return
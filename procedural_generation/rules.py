@@ -0,0 +1,86 @@
+import numpy as np
+
+
+def parse(rule):
+    """ birth and survival counts of a Life-like rule string
+
+    NB:
+    "B3/S23" is Conways, "B36/S23" HighLife and "B2/S" Seeds; "23/3" (S/B)
+    is read as well. Every digit is one count; for the larger counts of
+    bigger kernels the counts are separated by commas and may be ranges,
+    e.g. "B34-45/S33-57,60".
+
+    Args:
+        rule (string): rule string
+
+    Returns:
+        tuple: (birth, survival) sets of neighbour counts
+
+    Raises:
+        ValueError: raised for a malformed rule string
+    """
+    parts = rule.upper().replace(" ", "").split("/")
+    if len(parts) != 2:
+        raise ValueError("unexpected rule " + str(rule))
+
+    if parts[0][:1] == "S" or parts[1][:1] == "B":
+        parts.reverse()
+    if parts[0][:1] == "B" and parts[1][:1] == "S":
+        parts = [parts[0][1:], parts[1][1:]]
+    elif parts[0][:1].isalpha() or parts[1][:1].isalpha():
+        raise ValueError("unexpected rule " + str(rule))
+    else:
+        parts.reverse() # "23/3" is survival / birth
+
+    counts = []
+    for part in parts:
+        if "," in part or "-" in part:
+            tokens = [t.split("-") for t in part.split(",") if t != ""]
+        else:
+            tokens = [[c] for c in part]
+
+        found = set()
+        for token in tokens:
+            if len(token) > 2 or not all(t.isdigit() for t in token):
+                raise ValueError("unexpected rule " + str(rule))
+            found.update(range(int(token[0]), int(token[-1]) + 1))
+        counts.append(found)
+
+    return counts[0], counts[1]
+
+
+def table(rule, max_count=8):
+    """ next state of a cell for every code life * (max_count + 1) + count
+
+    Args:
+        rule (string): rule string, see parse()
+        max_count (int, optional): largest possible neighbour count, 8 for the Moore neighbourhood. Defaults to 8.
+
+    Returns:
+        np.array: (2 * (max_count + 1),) uint8 array of 0/1
+
+    Raises:
+        ValueError: raised for counts a cell can't have
+    """
+    birth, survival = parse(rule)
+    if max(birth | survival, default=0) > max_count:
+        raise ValueError("rule " + str(rule) + " has counts above " + str(max_count))
+
+    lut = np.zeros(2 * (max_count + 1), dtype=np.uint8)
+    lut[list(birth)] = 1
+    lut[[max_count + 1 + c for c in survival]] = 1
+    return lut
+
+
+def moore(radius=1):
+    """ kernel counting the neighbours within a square of the given radius
+
+    Args:
+        radius (int, optional): 1 for the 8 neighbours of Conways. Defaults to 1.
+
+    Returns:
+        np.array: (2 * radius + 1, 2 * radius + 1) int array, 0 in the center
+    """
+    kernel = np.ones((2 * radius + 1, 2 * radius + 1), dtype=int)
+    kernel[radius, radius] = 0
+    return kernel
@@ -0,0 +1,148 @@
+import numpy as np
+import rules
+
+
+class SparseConways():
+
+    def __init__(self, initial_config=None, size=None, tile=32, rule="B3/S23"):
+        """ the Game Of Life that only steps the tiles where something happens
+
+        NB:
+        The torus is split into tile x tile squares (the last row and column of
+        tiles may be smaller). A tile is recomputed if it or one of its eight
+        neighbour tiles changed in the last generation, all others can't change
+        and are skipped, so a world of still lifes and empty space costs almost
+        nothing per step. The recomputed tiles are gathered with a one cell
+        toroidal halo into one (n, tile + 2, tile + 2) batch and stepped together.
+
+        Ages are only written for the recomputed tiles: tile_time holds the
+        generation each tile's ages were last written at, and the age of a dead
+        cell is its stored age plus the generations since then (living cells
+        are always 0). pixel_age materializes them like Conways.pixel_age, so
+        cells that were only alive in the initial configuration stay at np.inf.
+        change_time holds the generation each tile last changed in, so a
+        display can redraw only the tiles that changed since it last looked.
+
+        Args:
+            initial_config (np.array, optional): Initial configuration for conways. Defaults to None.
+            size (tuple, optional): (H, W) of an empty world, if initial_config is None. Defaults to None.
+            tile (int, optional): side length of the tiles in cells. Defaults to 32.
+            rule (string, optional): Life-like rule string, see rules.parse(). Defaults to "B3/S23".
+        """
+        if initial_config is None:
+            assert len(size) == 2 and type(size) == type((0,)), "Not a valid size"
+            initial_config = np.zeros(size)
+
+        self.life = initial_config
+        self.size = initial_config.shape
+        self.tile = tile
+        self.table = rules.table(rule) # next state per life * 9 + count
+        self.generation = 0
+
+        self.tiles = (-(-self.size[0] // tile), -(-self.size[1] // tile))
+        self.active = np.ones(self.tiles, dtype=bool) # tiles changed in the last generation
+        self.stored_age = np.full(self.size, np.inf)
+        self.tile_time = np.zeros(self.tiles, dtype=np.int64)
+        self.change_time = np.zeros(self.tiles, dtype=np.int64)
+        return
+
+
+    def _neighbourhood(self, tiles):
+        # the tiles and their eight toroidal neighbours
+        near = tiles.copy()
+        for dy in (-1, 0, 1):
+            for dx in (-1, 0, 1):
+                near |= np.roll(tiles, (dy, dx), axis=(0, 1))
+        return near
+
+
+    def update(self):
+        """ implementation of one step of conways, on the active tiles only
+        """
+        self.generation += 1
+        ty, tx = np.nonzero(self._neighbourhood(self.active))
+        if len(ty) == 0:
+            return
+
+        h, w = self.size
+        t = self.tile
+        offsets = np.arange(t + 2) - 1
+        rows = (ty[:, None] * t + offsets) % h # (n, t + 2) with the halo, wrapped
+        cols = (tx[:, None] * t + offsets) % w
+
+        # step all tiles at once from a copy of them and their halos
+        block = self.life[rows[:, :, None], cols[:, None, :]]
+        num_neighbs = sum(block[:, 1 + dy:t + 1 + dy, 1 + dx:t + 1 + dx] for dy in (-1, 0, 1) for dx in (-1, 0, 1) if dy != 0 or dx != 0)
+        old = block[:, 1:-1, 1:-1]
+        new = self.table[9 * old.astype(np.intp) + num_neighbs.astype(np.intp)].astype(self.life.dtype)
+
+        # cells of the smaller tiles at the far edges beyond the world
+        valid = ((ty[:, None] * t + offsets[1:-1] < h)[:, :, None] & (tx[:, None] * t + offsets[1:-1] < w)[:, None, :])
+        self.active[...] = False
+        self.active[ty, tx] = ((new != old) & valid).any(axis=(1, 2))
+        self.change_time[self.active] = self.generation
+
+        r = np.broadcast_to(rows[:, 1:-1, None], new.shape)[valid]
+        c = np.broadcast_to(cols[:, None, 1:-1], new.shape)[valid]
+        self.life[r, c] = new[valid]
+
+        # bring the ages of the stepped tiles up to date
+        elapsed = self.generation - self.tile_time[ty, tx]
+        age = self.stored_age[r, c] + np.broadcast_to(elapsed[:, None, None], new.shape)[valid]
+        if self.generation > 1: # as in Conways, being alive in the initial configuration does not count
+            age[old[valid] == 1] = 1 # alive up to now, maybe in a tile that was skipped
+        age[new[valid] == 1] = 0
+        self.stored_age[r, c] = age
+        self.tile_time[ty, tx] = self.generation
+        return
+
+
+    @property
+    def pixel_age(self):
+        """ (H, W) float array of the steps since every cell was last alive, np.inf if never
+        """
+        return self._pixel_age(slice(None))
+
+
+    def _pixel_age(self, rows):
+        # pixel_age of some rows, from the stored ages and the time of their tiles
+        t = self.tile
+        r0, r1, _ = rows.indices(self.size[0])
+        elapsed = self.generation - self.tile_time[r0 // t:-(-r1 // t)]
+        elapsed = np.repeat(np.repeat(elapsed, t, axis=0), t, axis=1)[r0 % t:r0 % t + r1 - r0, :self.size[1]]
+        alive = (self.life[rows] == 1) & (self.generation > 0)
+        return np.where(alive, 0, self.stored_age[rows] + elapsed)
+
+
+    def get_grayscale(self, with_age=False, age_factor=0.5, rows=None):
+        """ the world as an array in [0, 1]
+
+        Args:
+            with_age (bool, optional): fade out dead cells with the steps since they were alive. Defaults to False.
+            age_factor (float, optional): fading per step. Defaults to 0.5.
+            rows (slice, optional): only these rows, e.g. those of the tiles that changed (see change_time). Defaults to None.
+
+        Returns:
+            np.array: (H, W) float array, (h, W) for rows
+        """
+        rows = slice(None) if rows is None else rows
+        if with_age:
+            return np.exp(np.log(age_factor) * self._pixel_age(rows)) # grayscale value of aged pixels
+
+        else:
+            return self.life[rows]
+
+
+    def get_frame(self):
+        """ the state of the world, e.g. for a recorder.Recorder
+
+        Returns:
+            dict: life as uint8
+        """
+        return {"life" : self.life.astype(np.uint8)}
+
+
+    def num_active(self):
+        """ number of tiles changed in the last generation
+        """
+        return int(self.active.sum())